@@ -0,0 +1,277 @@
+import time
+import numpy as np
+from typing import Optional, Tuple
+
+from agents.common import BoardPiece, PlayerAction, SavedState, GameDim, NO_PLAYER, opponent
+from agents.bitboard import BitBoard, board_to_bitboard, bitboard_from_pieces, fits_in_64_bits
+from agents.agent_mcts.mcts import default_nr_of_loops, generate_move_mcts, SavedStateMCTS
+
+
+# Flat MCTS tree: instead of Node objects with their own board, set and dict,
+# a node is an index to preallocated arrays. The board of a node is kept as two bit masks.
+# Per node it takes 2*8 (pieces) + 7*4 (children) + 4+4+4 (wins, trials, parent) + 8 (unexpanded) + 2 bytes.
+# The masks are np.uint64, so only boards, which fit in 64 bits, can be stored (see fits_in_64_bits).
+
+NO_NODE = -1
+
+STILL_PLAYING = 0
+IS_WIN = 1
+IS_DRAW = 2
+
+
+def random_playout(bitboard: BitBoard, player: BoardPiece, n: int = GameDim.CONNECT.value) -> BoardPiece:
+    """
+    Plays random moves on the bitboard (modifying it) till the end of the game.
+    :param player: the player to move.
+    :param n: numbers of pieces connected to win.
+    :return: the winner or NO_PLAYER for a draw.
+    """
+    while True:
+        moves = bitboard.legal_moves()
+        if not moves:
+            return NO_PLAYER
+        bitboard.play(moves[np.random.randint(len(moves))], player)
+        if bitboard.is_win(player, n):
+            return player
+        player = opponent(player)
+
+
+class FlatTree:
+    """
+    MCTS tree stored in NumPy arrays, growing by chunks.
+    wins[i]: wins of the player, who moved into the node i (it's what the parent uses for choosing).
+    trials[i]: playouts through the node i.
+    player[i]: the player to move at the node i.
+    parent[i], children[i, action]: indices of the nodes, NO_NODE if there is none.
+    pieces[i]: masks of the pieces of player 1 and 2 on the node's board.
+    unexpanded[i]: bit j is set, when the action j is legal and has no child yet.
+    state[i]: STILL_PLAYING, IS_WIN (the last move won) or IS_DRAW.
+    """
+
+    def __init__(self, board: np.ndarray, player: BoardPiece, chunk: int = 4096, c: float = 1.42,
+                 n: int = GameDim.CONNECT.value):
+        self.height, self.length = board.shape
+        if not fits_in_64_bits(self.height, self.length):
+            raise ValueError("The board doesn't fit in 64 bit masks.")
+        self.n = n
+        self.chunk = chunk
+        self.c = c
+        self.size = 0
+        self.capacity = 0
+        self.wins = np.zeros(0, dtype=np.int32)
+        self.trials = np.zeros(0, dtype=np.int32)
+        self.player = np.zeros(0, dtype=BoardPiece)
+        self.parent = np.zeros(0, dtype=np.int32)
+        self.children = np.zeros((0, self.length), dtype=np.int32)
+        self.pieces = np.zeros((0, 2), dtype=np.uint64)
+        self.unexpanded = np.zeros(0, dtype=np.int64)
+        self.state = np.zeros(0, dtype=np.int8)
+
+        bitboard = board_to_bitboard(board)
+        self.root = self._add_node(bitboard, player, NO_NODE, self._state(bitboard, opponent(player)))
+
+    def _grow(self):
+        """
+        Chunked reallocation of all the arrays.
+        """
+        new = self.capacity + self.chunk
+        self.wins = np.resize(self.wins, new)
+        self.trials = np.resize(self.trials, new)
+        self.player = np.resize(self.player, new)
+        self.parent = np.resize(self.parent, new)
+        self.children = np.resize(self.children, (new, self.length))
+        self.pieces = np.resize(self.pieces, (new, 2))
+        self.unexpanded = np.resize(self.unexpanded, new)
+        self.state = np.resize(self.state, new)
+        self.capacity = new
+
+    def _add_node(self, bitboard: BitBoard, player: BoardPiece, parent: int, state: int) -> int:
+        if self.size == self.capacity:
+            self._grow()
+        i = self.size
+        self.size += 1
+        self.wins[i] = 0
+        self.trials[i] = 0
+        self.player[i] = player
+        self.parent[i] = parent
+        self.children[i] = NO_NODE
+        self.pieces[i] = bitboard.pieces
+        self.unexpanded[i] = 0 if state != STILL_PLAYING else sum(1 << j for j in bitboard.legal_moves())
+        self.state[i] = state
+        return i
+
+    def _state(self, bitboard: BitBoard, last_player: BoardPiece) -> int:
+        if bitboard.is_win(last_player, self.n):
+            return IS_WIN
+        if bitboard.is_full():
+            return IS_DRAW
+        return STILL_PLAYING
+
+    def bitboard(self, node: int) -> BitBoard:
+        return bitboard_from_pieces(*self.pieces[node], self.height, self.length)
+
+    def _select_next_child(self, node: int) -> int:
+        """
+        UCB1 over the whole row of children at once.
+        """
+        kids = self.children[node]
+        kids = kids[kids != NO_NODE]
+        if self.trials[node] == 0:
+            return kids[np.random.randint(len(kids))]
+        trials = self.trials[kids]
+        ucb = self.wins[kids] / trials + self.c * np.sqrt(np.log(self.trials[node]) / trials)
+        return kids[np.argmax(ucb)]
+
+    def select(self) -> int:
+        """
+        From the root to a node with some unexpanded actions or an end game node.
+        """
+        node = self.root
+        while self.unexpanded[node] == 0 and self.state[node] == STILL_PLAYING:
+            node = self._select_next_child(node)
+        return node
+
+    def expand(self, node: int) -> int:
+        """
+        Adds a child for a random unexpanded action. End game nodes are returned as they are.
+        """
+        unexpanded = int(self.unexpanded[node])
+        if unexpanded == 0:
+            return node
+        actions = [j for j in range(self.length) if unexpanded >> j & 1]
+        action = actions[np.random.randint(len(actions))]
+
+        bitboard = self.bitboard(node)
+        player = self.player[node]
+        bitboard.play(action, player)
+
+        child = self._add_node(bitboard, opponent(player), node, self._state(bitboard, player))
+        self.children[node, action] = child
+        self.unexpanded[node] = unexpanded & ~(1 << action)
+        return child
+
+    def playout(self, node: int) -> BoardPiece:
+        """
+        :return: the winner of a random game from the node, NO_PLAYER for a draw.
+        """
+        if self.state[node] == IS_WIN:
+            return opponent(self.player[node])
+        if self.state[node] == IS_DRAW:
+            return NO_PLAYER
+        return random_playout(self.bitboard(node), self.player[node], self.n)
+
+    def backprop(self, node: int, winner: BoardPiece):
+        """
+        Increases trials up to the root, and wins of the nodes the winner moved into (draws don't change wins).
+        """
+        while node != NO_NODE:
+            self.trials[node] += 1
+            if winner != NO_PLAYER and winner != self.player[node]:
+                self.wins[node] += 1
+            node = self.parent[node]
+
+    def search(self, nr_of_loops: Optional[int] = None, time_limit_ms: Optional[float] = None) -> int:
+        """
+        Same budgets as MCTS.search.
+        """
+        if nr_of_loops is None and time_limit_ms is None:
+            raise ValueError("The search needs a budget: nr_of_loops or time_limit_ms.")
+        deadline = None if time_limit_ms is None else time.perf_counter() + time_limit_ms / 1000
+
+        loop = 0
+        while True:
+            leaf = self.expand(self.select())
+            self.backprop(leaf, self.playout(leaf))
+            loop += 1
+            if nr_of_loops is not None and loop >= nr_of_loops:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return loop
+
+    def best_action(self) -> PlayerAction:
+        """
+        The most visited child of the root.
+        """
+        kids = self.children[self.root]
+        trials = np.where(kids != NO_NODE, self.trials[kids], -1)
+        return PlayerAction(np.argmax(trials))
+
+    def reroot(self, new_root: int):
+        """
+        Makes new_root the root and compacts the arrays, so they only keep its subtree.
+        """
+        order = [new_root]
+        for i in order:  # breadth first, the list grows while iterating
+            order.extend(int(k) for k in self.children[i] if k != NO_NODE)
+        old = np.array(order, dtype=np.int32)
+        remap = np.full(self.size, NO_NODE, dtype=np.int32)
+        remap[old] = np.arange(len(old), dtype=np.int32)
+
+        self.wins[:len(old)] = self.wins[old]
+        self.trials[:len(old)] = self.trials[old]
+        self.player[:len(old)] = self.player[old]
+        self.parent[:len(old)] = np.where(old == new_root, NO_NODE, remap[self.parent[old]])
+        kids = self.children[old]
+        self.children[:len(old)] = np.where(kids != NO_NODE, remap[kids], NO_NODE)
+        self.pieces[:len(old)] = self.pieces[old]
+        self.unexpanded[:len(old)] = self.unexpanded[old]
+        self.state[:len(old)] = self.state[old]
+        self.size = len(old)
+        self.root = 0
+
+    def advance(self, board: np.ndarray, player: BoardPiece) -> bool:
+        """
+        Finds the node of the board among the root's children and makes it the root.
+        :return: False, if the board is not in the tree (the tree is then left as it was).
+        """
+        key = board_to_bitboard(board).pieces
+        for child in self.children[self.root]:
+            if child == NO_NODE:
+                continue
+            if list(self.pieces[child]) == key and self.player[child] == player:
+                self.reroot(child)
+                return True
+        return False
+
+    def nbytes(self) -> int:
+        """
+        Memory used by the nodes of the tree.
+        """
+        arrays = (self.wins, self.trials, self.player, self.parent, self.children, self.pieces,
+                  self.unexpanded, self.state)
+        return sum(array[:self.size].nbytes for array in arrays)
+
+
+class SavedStateFlatMCTS(SavedState):
+    def __init__(self, tree: FlatTree):
+        self.tree = tree
+        self.iterations = 0  # loops run for the last move
+
+
+def generate_move_mcts_flat(
+        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+        time_limit_ms: Optional[float] = None, nr_of_loops: Optional[int] = None,
+        n: int = GameDim.CONNECT.value
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    generate_move_mcts on the flat tree. The tree is reused between the moves,
+    if the opponent's move is found in it, otherwise a new one is started.
+    Boards too big for 64 bit masks are searched by generate_move_mcts (with its saved state).
+    :return: the most visited action and the saved state with the tree.
+    """
+    if not fits_in_64_bits(*board.shape):
+        saved_state = saved_state if isinstance(saved_state, SavedStateMCTS) else None
+        return generate_move_mcts(board, player, saved_state, time_limit_ms, nr_of_loops, n=n)
+    if not isinstance(saved_state, SavedStateFlatMCTS) or saved_state.tree.n != n \
+            or not saved_state.tree.advance(board, player):
+        saved_state = SavedStateFlatMCTS(FlatTree(board, player, n=n))
+    t = saved_state.tree
+
+    if time_limit_ms is None and nr_of_loops is None:
+        nr_of_loops = default_nr_of_loops(board)
+    saved_state.iterations = t.search(nr_of_loops, time_limit_ms)
+
+    action = t.best_action()
+    t.reroot(t.children[t.root, action])
+    return action, saved_state
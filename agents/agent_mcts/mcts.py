@@ -1,8 +1,14 @@
+import time
 import numpy as np
-from agents.common import BoardPiece, PlayerAction, GameState, SavedState, \
-    apply_player_action, available_moves, opponent, check_end_state
+from agents.common import BoardPiece, PlayerAction, GameDim, GameState, SavedState, \
+    apply_player_action, available_moves, opponent, check_end_state, lowest_free
+from agents.bitboard import board_to_bitboard
+from agents.agent_mcts.batch import batch_playout
+from agents.transposition import zobrist_hash, zobrist_update
+from agents.opening_book import book_move
+from agents.agent_solver.solver import solve_move
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Callable, Dict
 
 
 # Monte Carlo Tree Search
@@ -19,17 +25,59 @@ class Node:
         - player to move
         - state of the board
         - parent, children
+        - the action, which led to the node (None, if not known)
     """
 
-    def __init__(self, board: np.ndarray, player: BoardPiece, parent="root"):
+    def __init__(self, board: np.ndarray, player: BoardPiece, parent="root", action=None):
         self.board = board
         self.player = player
         self.parent = parent            # parent is a node or string
+        self.action = action            # the last action on the node's board
         self.unexpanded = set(available_moves(board))
         self.children = {}              # {"action": new_node}
         self.wins = 0
         self.trials = 0
 
+    def new_child(self, board: np.ndarray, player: BoardPiece, action: PlayerAction) -> 'Node':
+        return Node(board, player, parent=self, action=action)
+
+
+class TranspositionNode(Node):
+    """
+    Node of the MCTS-DAG mode: nodes of the same position (reached by different move orders)
+    share one [wins, trials] record of the table, keyed by the Zobrist hash of the board.
+    The tree structure stays, so backprop along the parents updates every shared record once.
+    """
+
+    def __init__(self, board: np.ndarray, player: BoardPiece, parent="root", action=None,
+                 table: Optional[dict] = None, key: Optional[int] = None):
+        self.stats = [0, 0]
+        super().__init__(board, player, parent, action)
+        self.table = {} if table is None else table
+        self.key = zobrist_hash(board) if key is None else key
+        self.stats = self.table.setdefault(self.key, self.stats)
+
+    @property
+    def wins(self):
+        return self.stats[0]
+
+    @wins.setter
+    def wins(self, value):
+        self.stats[0] = value
+
+    @property
+    def trials(self):
+        return self.stats[1]
+
+    @trials.setter
+    def trials(self, value):
+        self.stats[1] = value
+
+    def new_child(self, board: np.ndarray, player: BoardPiece, action: PlayerAction) -> 'TranspositionNode':
+        row = lowest_free(board, action) - 1
+        key = zobrist_update(self.key, row, action, self.player, *board.shape)
+        return TranspositionNode(board, player, parent=self, action=action, table=self.table, key=key)
+
 
 class MCTS:
     # class for MCTS, storing root etc.
@@ -40,11 +88,19 @@ class MCTS:
     giving a best evaluated move - ratio wins/trials starting from the root.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, playouts_per_leaf: int = 1, n: int = GameDim.CONNECT.value):
+        """
+        :param playouts_per_leaf: with more than one, every loop simulates that many games at once
+            from the expanded leaf (batch_playout) and backpropagates them together.
+        :param n: numbers of pieces connected to win (the board size comes with the root's board).
+        """
         if isinstance(root, Node):
             self.root = root
         else:
             raise TypeError
+        self.playouts_per_leaf = playouts_per_leaf
+        self.n = n
+        self.selection_depth = 0  # depth of the last selected leaf
 
     @staticmethod
     def expand(node: Node):
@@ -67,7 +123,7 @@ class MCTS:
 
             # Checking if the child is an end-node, should be in the playout method.
 
-            child = Node(child_board, opponent(node.player), parent=node)  # assign to the child, the parent
+            child = node.new_child(child_board, opponent(node.player), action)  # assign to the child, the parent
             node.children[action] = child                                  # assign to the parent, the child
 
             node.unexpanded.remove(action)
@@ -75,7 +131,7 @@ class MCTS:
         return child
 
     @staticmethod
-    def playout(node: Node) -> (Node, GameState, BoardPiece):
+    def playout(node: Node, n: int = GameDim.CONNECT.value) -> (Node, GameState, BoardPiece):
         """
         Simulation of the game is carried out till it's end.
         Use random agent.
@@ -85,15 +141,16 @@ class MCTS:
         :argument: node
         :return: Triple of a starting (last) node, a (win or draw) and the player, who moved last.
         """
-        # maydo: use human_vs_agent function to playout random vs random.
-
-        from agents.agent_random.random import generate_move_random
+        # The random game is played on a bitboard copy of the node's board, the ndarray board stays untouched.
         player_new = node.player.copy()
-        board_new = node.board.copy()
+        board_new = board_to_bitboard(node.board)
         node._count = 0
 
-        while check_end_state(board_new, opponent(player_new)) == GameState.STILL_PLAYING:
-            action_new = generate_move_random(board_new, player_new, None)
+        # The node knows the last action, so only the lines through the last piece are checked.
+        game_state = check_end_state(node.board, opponent(player_new), node.action, n)
+        while game_state == GameState.STILL_PLAYING:
+            moves = board_new.legal_moves()
+            action_new = moves[np.random.randint(len(moves))]
 
             # If at least one is unexpanded, we can start playout.
             # Handling the case with mixture of expanded and unexpanded moves:
@@ -101,11 +158,12 @@ class MCTS:
                 node = node.children[action_new]
                 node._count = 0
 
-            board_new = apply_player_action(board_new, action_new, player_new)
+            board_new.play(action_new, player_new)
+            game_state = board_new.end_state(player_new, n)
             player_new = opponent(player_new)
             node._count += 1
 
-        result = node, check_end_state(board_new, opponent(player_new)), player_new
+        result = node, game_state, player_new
 
         return result
 
@@ -125,13 +183,35 @@ class MCTS:
         if not node == "root":
             node.trials += 1
 
-            if last_player == node.player:  # careful with who is the opponent, look commentary above
+            # careful with who is the opponent, look commentary above
+            if game_state == GameState.IS_WIN and last_player == node.player:
                 node.wins += 1
             self.backprop(node.parent, game_state, last_player)
 
         elif node == "root":
             pass
 
+    @staticmethod
+    def playout_batch(node: Node, nr_of_games: int, n: int = GameDim.CONNECT.value) -> (Node, np.ndarray):
+        """
+        Simulates nr_of_games random games from the node at once.
+        :return: the node and the counts of results [draws, wins of player 1, wins of player 2].
+        """
+        return node, batch_playout(node.board, node.player, nr_of_games, n)
+
+    @staticmethod
+    def backprop_batch(node: Node, results: np.ndarray):
+        """
+        Backprop of many playouts in one call: trials grow by the number of games,
+        wins by the wins of the player, who moved into the node (draws don't change wins),
+        as in backprop.
+        """
+        nr_of_games = int(results.sum())
+        while node != "root":
+            node.trials += nr_of_games
+            node.wins += int(results[opponent(node.player)])
+            node = node.parent
+
     def _select_next_child(self, parent: Node, c=1.42) -> Node:
         """
         UCB - upper confidence bound - the bigger, the better for the node.
@@ -163,8 +243,9 @@ class MCTS:
         Todo: Evaluate UCB for children, after updating the parent (or adding 1 in equation before the update).
         """
         # Prepare wins, trials data (parent trials are prepared).
-        wins = np.zeros(7)
-        trials = np.full(7, np.infty)  # if no child, we divide by infinity and get zero ucb value.
+        length = parent.board.shape[1]
+        wins = np.zeros(length)
+        trials = np.full(length, np.infty)  # if no child, we divide by infinity and get zero ucb value.
         for action_str, node in parent.children.items():
             wins[int(action_str)] = node.wins
             trials[int(action_str)] = node.trials
@@ -190,14 +271,184 @@ class MCTS:
         """
 
         the_child = self.root
+        self.selection_depth = 0
         while the_child.unexpanded == set() and not len(available_moves(the_child.board)) == 0:
 
             the_child = self._select_next_child(the_child)
+            self.selection_depth += 1
         return the_child
 
+    def tree_size(self) -> int:
+        """
+        Number of nodes under (and including) the root.
+        """
+        size, nodes = 0, [self.root]
+        while nodes:
+            size += 1
+            nodes.extend(nodes.pop().children.values())
+        return size
+
+    def advance(self, board: np.ndarray, player: BoardPiece) -> Optional[int]:
+        """
+        Tree reuse: makes the node of the board (with the player to move) the root.
+        The node is looked for among the descendants of the root, following the pieces which
+        were added to the board; the nodes missing on the way (moves never expanded) are created.
+        The new root is detached from its parent, so the rest of the tree is released
+        (and in the MCTS-DAG mode, the records of the positions not in the subtree).
+        :return: the number of simulations inherited by the new root,
+            None if the board can't be reached from the root (the tree is left as it was).
+        """
+        node = self.root
+        if board.shape != node.board.shape or not ((node.board == 0) | (node.board == board)).all():
+            return None
+
+        while (node.board != board).any():
+            for action in available_moves(node.board):
+                row = lowest_free(node.board, action)
+                if board[row, action] == node.player:
+                    break
+            else:
+                return None
+            if action not in node.children:
+                node.unexpanded.discard(action)
+                node.children[action] = node.new_child(
+                    apply_player_action(node.board, action, node.player, copy=True), opponent(node.player), action
+                )
+            node = node.children[action]
+
+        if node.player != player:
+            return None
+        self.set_root(node)
+        return node.trials
+
+    def set_root(self, node: Node):
+        """
+        Detaches the node from its parent and makes it the root.
+        """
+        node.parent = "root"
+        self.root = node
+        if isinstance(node, TranspositionNode):
+            keys, nodes = set(), [node]
+            while nodes:
+                next_node = nodes.pop()
+                keys.add(next_node.key)
+                nodes.extend(next_node.children.values())
+            for key in set(node.table) - keys:
+                del node.table[key]
+
+    def search(
+            self, nr_of_loops: Optional[int] = None, time_limit_ms: Optional[float] = None,
+            stats: Optional['SearchStats'] = None, callback: Optional[Callable] = None
+    ) -> int:
+        """
+        Anytime search: runs the select-expand-playout-backprop loop until the budget is used up.
+        With both budgets the search stops at whichever comes first. At least one loop is always run.
+        :param nr_of_loops: the maximal number of loops (a loop makes playouts_per_leaf playouts).
+        :param time_limit_ms: the wall clock budget in milliseconds.
+        :param stats: if given, it's filled with the statistics of the search (see SearchStats).
+        :param callback: called after every loop as callback(tree, loop, leaf).
+        :return: the number of loops actually run.
+        """
+        if nr_of_loops is None and time_limit_ms is None:
+            raise ValueError("The search needs a budget: nr_of_loops or time_limit_ms.")
+        start = time.perf_counter()
+        deadline = None if time_limit_ms is None else start + time_limit_ms / 1000
+        if stats is not None:
+            stats.reused_nodes = self.tree_size()
+            stats.reused_trials = self.root.trials
+        phase_times = [0., 0., 0., 0.]  # select, expand, playout, backprop
+
+        loop = 0
+        while True:
+            t0 = time.perf_counter()
+            selected = self.select()
+            t1 = time.perf_counter()
+            leaf = self.expand(selected)
+            t2 = time.perf_counter()
+            if self.playouts_per_leaf > 1:
+                result = self.playout_batch(leaf, self.playouts_per_leaf, self.n)
+                t3 = time.perf_counter()
+                self.backprop_batch(*result)
+            else:
+                result = self.playout(leaf, self.n)
+                t3 = time.perf_counter()
+                self.backprop(*result)
+            t4 = time.perf_counter()
+            phase_times[0] += t1 - t0
+            phase_times[1] += t2 - t1
+            phase_times[2] += t3 - t2
+            phase_times[3] += t4 - t3
+            loop += 1
+            if stats is not None:
+                stats.max_depth = max(stats.max_depth, self.selection_depth + (leaf is not selected))
+            if callback is not None:
+                callback(self, loop, leaf)
+            if nr_of_loops is not None and loop >= nr_of_loops:
+                break
+            if deadline is not None and t4 >= deadline:
+                break
+
+        if stats is not None:
+            stats.iterations = loop
+            stats.playouts = loop * self.playouts_per_leaf
+            stats.elapsed = time.perf_counter() - start
+            stats.phase_times = dict(zip(("select", "expand", "playout", "backprop"), phase_times))
+            stats.tree_size = self.tree_size()
+            stats.root_visits = {int(action): child.trials for action, child in self.root.children.items()}
+        return loop
+
+
+class SearchStats:
+    """
+    Statistics of one search (one move), filled by MCTS.search:
+        - iterations: loops run, playouts: games simulated (more than loops with batched playouts),
+        - elapsed: seconds, and the seconds spent in each phase (phase_times),
+        - tree_size: nodes under the root after the search, max_depth: the deepest leaf reached,
+        - reused_nodes, reused_trials: nodes and simulations inherited from the previous moves,
+        - root_visits: {action: trials} of the root's children, the visit distribution.
+    """
+
+    def __init__(self):
+        self.iterations = 0
+        self.playouts = 0
+        self.elapsed = 0.
+        self.phase_times: Dict[str, float] = {}
+        self.tree_size = 0
+        self.max_depth = 0
+        self.reused_nodes = 0
+        self.reused_trials = 0
+        self.root_visits: Dict[int, int] = {}
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.
+
+    def __repr__(self):
+        return (f"SearchStats(iterations={self.iterations}, playouts/s={self.playouts_per_second:.0f}, "
+                f"tree_size={self.tree_size}, max_depth={self.max_depth}, reused_nodes={self.reused_nodes}, "
+                f"root_visits={self.root_visits})")
+
+
+# The endgame is solved exactly (a handful of milliseconds with 14 empty cells of the 6x7 board).
+SOLVER_EMPTY_CELLS = 14
+SOLVER_TIME_LIMIT_MS = 1000
+
+
+def default_nr_of_loops(board: np.ndarray) -> int:
+    """
+    Number of select-expand-playout-backprop loops for one move, depending on the pieces on the board.
+    """
+    # With 3k loops it's really good, but slow.
+    if np.count_nonzero(board) in range(6):
+        return 2000
+    return 1500
+
 
 def generate_move_mcts(
-        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+        time_limit_ms: Optional[float] = None, nr_of_loops: Optional[int] = None,
+        playouts_per_leaf: int = 1, transpositions: bool = False, callback: Optional[Callable] = None,
+        n: int = GameDim.CONNECT.value, book: bool = True, solver_cells: int = SOLVER_EMPTY_CELLS
 ) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
     The function unpack the tree from saved state.
@@ -206,32 +457,61 @@ def generate_move_mcts(
     :board: the games board at present.
     :player: the board piece to make a move.
     :saved_state: the instance of the saved state (might be None at first).
-
-    :return: the action and the instance of the saved state, which stores the tree.
+    :time_limit_ms: wall clock budget of the move.
+    :nr_of_loops: playout budget of the move. Without any budget, default_nr_of_loops is used.
+    :playouts_per_leaf: random games simulated at once from every expanded leaf.
+    :transpositions: MCTS-DAG mode, statistics of identical positions are merged (used for a new tree).
+    :callback: called after every loop of the search, as callback(tree, loop, leaf).
+    :n: numbers of pieces connected to win. The board may be of any size.
+    :book: if the position is in the opening book (agents.opening_book), its move is played without searching.
+        The tree of the saved state is left as it is then (a new one starts after the move),
+        it catches up with the board at the next search.
+    :solver_cells: with that many empty cells or less, the position is solved exactly (agents.agent_solver),
+        within the time limit (SOLVER_TIME_LIMIT_MS without one). The search runs only if it's not solved in time.
+        The tree is left as with the book.
+
+    :return: the action and the instance of the saved state, which stores the tree,
+        the number of loops run (saved_state.iterations) and the number of simulations
+        inherited from the previous moves (saved_state.reused_trials).
+        The statistics of the search are in saved_state.stats (SearchStats).
 
     maydo: Optimize nr of loops as a function of the current nr of pieces on board,
         so it passes a test of blocking the opponent in next move (avoiding opponent win in the next move).
     """
 
-    # Unpack saved state.
-    if saved_state is None:
-        root = Node(board, player)
-        t = MCTS(root)  # stands for a tree
+    start = time.perf_counter()
+    entry = book_move(board, n) if book else None
+    if entry is None and np.count_nonzero(board == 0) <= solver_cells:
+        entry = solve_move(board, player, n, SOLVER_TIME_LIMIT_MS if time_limit_ms is None else time_limit_ms)
+        if time_limit_ms is not None:
+            time_limit_ms = max(time_limit_ms - (time.perf_counter() - start) * 1000, 1.)
+    if entry is not None:
+        if not isinstance(saved_state, SavedStateMCTS):
+            child_board = apply_player_action(board, entry[0], player, copy=True)
+            root = TranspositionNode(child_board, opponent(player)) if transpositions \
+                else Node(child_board, opponent(player))
+            saved_state = SavedStateMCTS(MCTS(root, n=n))
+        saved_state.iterations, saved_state.stats = 0, None
+        return entry[0], saved_state
+
+    # Unpack saved state, a new tree is started, if the board is not reachable from the saved root.
+    reused_trials = None if saved_state is None else saved_state.tree.advance(board, player)
+    if reused_trials is None:
+        root = TranspositionNode(board, player) if transpositions else Node(board, player)
+        t = MCTS(root, n=n)  # stands for a tree
         saved_state = SavedStateMCTS(t)
     else:
         t = saved_state.tree
-        index_last_action = np.argwhere(board != t.root.board)
-        t.root = t.root.children[int(index_last_action[:,1])]
+    saved_state.reused_trials = reused_trials or 0
 
-    # With 3k loops it's really good, but slow.
-    if np.count_nonzero(board) in range(6):
-        nr_of_loops = 2000
-    else:
-        nr_of_loops = 1500
+    if time_limit_ms is None and nr_of_loops is None:
+        nr_of_loops = default_nr_of_loops(board)
+    t.playouts_per_leaf = playouts_per_leaf
+    t.n = n
 
     # The MCTS usage.
-    for loop in range(nr_of_loops):
-        t.backprop(*t.playout(t.expand(t.select())))
+    saved_state.stats = SearchStats()
+    saved_state.iterations = t.search(nr_of_loops, time_limit_ms, saved_state.stats, callback)
     child = t._select_next_child(t.root)
 
     # From the node obtain the action.
@@ -241,7 +521,7 @@ def generate_move_mcts(
             break
 
     # Update situation saved.
-    t.root = t.root.children[action]
+    t.set_root(t.root.children[action])
     saved_state.tree = t
 
     return action, saved_state
@@ -252,4 +532,7 @@ class SavedStateMCTS(SavedState):
         """
         :rtype: object
         """
-        self.tree = tree
\ No newline at end of file
+        self.tree = tree
+        self.iterations = 0  # loops run for the last move
+        self.reused_trials = 0  # simulations of the root inherited from the previous moves
+        self.stats = None  # SearchStats of the last move
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import atexit
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple, Dict, List
+
+from agents.common import BoardPiece, PlayerAction, SavedState, GameDim
+from agents.agent_mcts.mcts import MCTS, Node, default_nr_of_loops
+
+
+# Root parallelization: every worker process grows its own tree from the same root,
+# and only the statistics of the root's children are merged.
+# The pool is created once and kept alive between the moves (and games), since spawning
+# processes costs more than a whole move.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def get_pool(nr_of_workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the worker pool, creating it at the first call
+    (or again, when a different number of workers is asked for).
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != nr_of_workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=nr_of_workers)
+        _pool_workers = nr_of_workers
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+    _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def root_statistics(
+        board: np.ndarray, player: BoardPiece, nr_of_loops: Optional[int], seed: int,
+        time_limit_ms: Optional[float] = None, n: int = GameDim.CONNECT.value
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Runs one independent tree (in a worker process), with the budgets of MCTS.search.
+    :param seed: every worker has to get its own seed, otherwise forked workers grow identical trees.
+    :param n: numbers of pieces connected to win.
+    :return: {action: (wins, trials)} of the root's children.
+    """
+    np.random.seed(seed)
+    t = MCTS(Node(board, player), n=n)
+    t.search(nr_of_loops, time_limit_ms)
+    return {int(action): (child.wins, child.trials) for action, child in t.root.children.items()}
+
+
+def merge_root_statistics(statistics: List[Dict[int, Tuple[int, int]]]) -> Dict[int, Tuple[int, int]]:
+    """
+    Sums wins and trials of the same action over all the trees.
+    """
+    merged = {}
+    for stats in statistics:
+        for action, (wins, trials) in stats.items():
+            old_wins, old_trials = merged.get(action, (0, 0))
+            merged[action] = (old_wins + wins, old_trials + trials)
+    return merged
+
+
+def best_action(merged: Dict[int, Tuple[int, int]]) -> PlayerAction:
+    """
+    The most visited action. With summed statistics of many trees the visit count
+    is more robust than the ratio wins/trials of rarely visited children.
+    """
+    return PlayerAction(max(merged, key=lambda action: merged[action][1]))
+
+
+class SavedStateParallelMCTS(SavedState):
+    def __init__(self, nr_of_workers: int, statistics: Dict[int, Tuple[int, int]]):
+        """
+        :param statistics: merged {action: (wins, trials)} of the last move.
+        """
+        self.nr_of_workers = nr_of_workers
+        self.statistics = statistics
+
+
+def generate_move_mcts_parallel(
+        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+        nr_of_workers: Optional[int] = None, nr_of_loops: Optional[int] = None,
+        time_limit_ms: Optional[float] = None, n: int = GameDim.CONNECT.value
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Root parallel MCTS: nr_of_workers independent trees are searched in the worker pool,
+    each with the full budget, then the statistics of the root's children are merged.
+    :param nr_of_workers: size of the pool, all the cores by default
+        (or the number of workers of the saved state).
+    :param nr_of_loops: loops of every tree. Without any budget, as in generate_move_mcts.
+    :param time_limit_ms: wall clock budget of every tree.
+    :param n: numbers of pieces connected to win.
+    :return: the most visited action and the saved state with the merged statistics.
+    """
+    if nr_of_workers is None:
+        nr_of_workers = saved_state.nr_of_workers if isinstance(saved_state, SavedStateParallelMCTS) \
+            else os.cpu_count()
+    if nr_of_loops is None and time_limit_ms is None:
+        nr_of_loops = default_nr_of_loops(board)
+
+    pool = get_pool(nr_of_workers)
+    seeds = np.random.randint(2 ** 31, size=nr_of_workers)
+    futures = [pool.submit(root_statistics, board, player, nr_of_loops, int(seed), time_limit_ms, n) for seed in seeds]
+    merged = merge_root_statistics([future.result() for future in futures])
+
+    return best_action(merged), SavedStateParallelMCTS(nr_of_workers, merged)
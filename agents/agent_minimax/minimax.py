@@ -1,101 +1,214 @@
+import time
 import numpy as np
-from typing import Optional, Tuple
-from agents.common import BoardPiece, PlayerAction, SavedState, GameState, lowest_free, apply_player_action, check_end_state, GameDim
-
-
-class SavedMiniMax(SavedState):
-    def __init__(self, depth_1, count_depth_1, heuristic_for_action_1, story_1, board_6):
-        self.depth = depth_1
-        self.heuristic_for_action = heuristic_for_action_1
-        self.max_heuristic_for_action = story_1
-        self.count_depth = count_depth_1
-        self.board_5 = board_6
-        # Remark: naming things with numerical values is often confusing and easy to mess up. Expressive names are important!
-        # here: numbers are just for local variables to have some distinguishment when debugging, but not too distracting.
-
-
-def heuristic_func(depth_count: int, game_state: GameState) -> float:
-    """"
-    Knowing which depth we are considering we can deduce, if it is an opponent or a player.
-    Accordingly, we give heuristics positive or negative.
-    1st version is with just wins and loses normalized according to depth.
+from typing import Optional, Tuple, List
+from agents.common import BoardPiece, PlayerAction, SavedState, GameDim, LineCounts, opponent
+from agents.bitboard import BitBoard, board_to_bitboard, bitboard_to_board
+from agents.opening_book import book_move
+from agents.transposition import TranspositionTable, zobrist_hash, zobrist_update, \
+    EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+
+
+# Negamax with alpha-beta pruning on the bitboard: the value of a position is always
+# from the point of view of the player to move, so the value for the opponent is its negative.
+# Wins are worth WIN_SCORE minus the number of plies to the win, so faster wins are preferred.
+WIN_SCORE = 1000000
+WIN_THRESHOLD = WIN_SCORE - 10000  # values above are wins (below -WIN_THRESHOLD losses)
+TIME_CHECK_NODES = 1024
+# Value of a line with k pieces of one player and none of the other (k = 0, 1, 2, 3).
+LINE_WEIGHTS = np.array([0, 1, 10, 50], dtype=np.int64)
+
+
+def line_weights(n: int = GameDim.CONNECT.value) -> np.ndarray:
+    """
+    LINE_WEIGHTS for connect-n. For other n, the line one piece short of a win is worth 50
+    and every further missing piece divides the weight by 5 (down to 1).
     """
+    if n == len(LINE_WEIGHTS):
+        return LINE_WEIGHTS
+    return np.array([0] + [max(50 // 5 ** (n - 1 - k), 1) for k in range(1, n)], dtype=np.int64)
 
 
+class SearchTimeout(Exception):
+    pass
 
-def generate_move_minimax(
-        board_0: np.ndarray, player: BoardPiece, state: Optional[SavedState]
-        ) -> Tuple[PlayerAction, Optional[SavedState]]:
+
+class SavedStateMinimax(SavedState):
+    def __init__(self, length: int = GameDim.LENGTH.value, table_size_log2: int = 18):
+        """
+        Everything the search learns and keeps between the moves:
+            - the transposition table,
+            - the history heuristic (cutoffs per player and column),
+        and the statistics of the last search (depth reached, nodes, value).
+        """
+        self.table = TranspositionTable(table_size_log2)
+        self.history = np.zeros((3, length), dtype=np.int64)
+        self.depth = 0
+        self.nodes = 0
+        self.value = 0
+
+
+def center_first(length: int) -> List[int]:
+    """
+    Columns ordered from the center out, central columns take part in the most lines.
+    """
+    return sorted(range(length), key=lambda j: abs(2 * j - (length - 1)))
+
+
+def evaluate(line_counts: LineCounts, player: BoardPiece) -> int:
+    """
+    Static evaluation for the player to move: the lines still open to only one of the players,
+    weighted by their pieces (LINE_WEIGHTS, an open three is worth the most), mine minus the opponent's.
+    Central cells take part in the most lines, so they count the most without a separate term.
+    """
+    return line_counts.score(player)
+
+
+class Search:
     """
-    The function checks if action leads to win, if Yes it returns it,
-    if No it avoids opponents wins. For each opponent response a heuristic[0] is calculated.
-    It increments, when there is a win opportunity for the player.
-    At the end of the function heuristic[0] is normalized according to depth,
-    to have values from 0 to 1 (sth like a likely-hood of winning),
-    unless heuristic[0] is -infinity, which means that opponent can force a win.
-    Heuristic[1] is just an action considered by the player.
+    One iterative deepening search, with the killer moves of every ply
+    and the table and history heuristic of the saved state.
     """
-    # TODO: implement a proper alpha-beta pruning structure.
-    # maydo: checking for immediate win could be as a first iteration.
-
-    # Remark: this function is way too long. Generally, functions should only do one specific thing, which makes them
-    #         easier to understand, maintain, and test. So you should heavily refactor this function and split it up.
-
-    if state is None:
-        state = SavedState(2,               # max depth
-                           0,               # count depth
-                           [0, None],       # current heuristic, action
-                           [0, None],       # best untill now heuristic, action
-                           board_0
-                           )
-
-    heuristic = state.heuristic_for_action[0]
-    opponent = BoardPiece((player % 2) + 1)
-
-    # ugly dealing with a bug, that spams the whole row with board pieces in the original board
-    if state.count_depth == 0:
-        state.board_5 = board_0
-
-    possible_moves = []
-    for hp_action in range(GameDim.LENGTH.value):
-        if lowest_free(board_0, hp_action) < 6:
-            PlayerAction(possible_moves.append(hp_action))
-
-
-    # Remark: In general, you should refactor this part. You have a lot of repeated stuff below, which you can
-    #         bring into a more concise form
-    # Remark: So far, you're only checking for wins/losses/draws. You need to make the transition to true minimax!
-    for hp_action in possible_moves:
-
-        hp_board = apply_player_action(board_0, hp_action, player, copy=True)
-        hp_game_state = check_end_state(hp_board, player)
-        if hp_game_state == GameState.IS_DRAW:
-            state.heuristic_for_action = (0, hp_action)
-        if hp_game_state == GameState.IS_WIN:
-            # TODO: use heuristic func
-            state.heuristic_for_action = (heuristic_func(), hp_action)
-        if (hp_re_game_state == GameState.STILL_PLAYING) and (state.count_depth != state.depth):
-                            state.count_depth += 1
-                            generate_move_minimax(hp_re_board, player, state)
-                            # Remark: it's a bit weird that you start recursion only here, and not in the first loop.
-
-        # end of searched depth tree
+
+    def __init__(self, bitboard: BitBoard, state: SavedStateMinimax, deadline: Optional[float],
+                 n: int = GameDim.CONNECT.value):
+        self.bitboard = bitboard
+        self.line_counts = LineCounts.from_board(bitboard_to_board(bitboard), n, line_weights(n))
+        self.table = state.table
+        self.history = state.history
+        self.deadline = deadline
+        self.order = center_first(bitboard.length)
+        self.killers = [[NO_MOVE, NO_MOVE] for ply in range(bitboard.height * bitboard.length + 1)]
+        self.nodes = 0
+
+    def ordered_moves(self, player: BoardPiece, ply: int, table_move: int) -> List[int]:
+        """
+        The move from the table first, then the killer moves of the ply,
+        then the rest by the history heuristic (ties stay center first).
+        """
+        bitboard = self.bitboard
+        moves = [j for j in self.order if bitboard.can_play(j)]
+        history = self.history[player]
+        moves.sort(key=lambda j: -history[j])
+        for first in (self.killers[ply][1], self.killers[ply][0], table_move):
+            if first in moves:
+                moves.remove(first)
+                moves.insert(0, first)
+        return moves
+
+    def negamax(self, player: BoardPiece, depth: int, alpha: int, beta: int, ply: int, key: int) -> Tuple[int, int]:
+        """
+        :return: the value of the position for the player to move and the best move.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % TIME_CHECK_NODES == 0 \
+                and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        bitboard = self.bitboard
+        if bitboard.is_full():
+            return 0, NO_MOVE
+
+        alpha_original = alpha
+        table_move = NO_MOVE
+        entry = self.table.probe(key)
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            value = value - ply if value > WIN_THRESHOLD else value + ply if value < -WIN_THRESHOLD else value
+            if entry_depth >= depth and ply > 0:
+                if flag == EXACT:
+                    return value, table_move
+                if flag == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                elif flag == UPPER_BOUND:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, table_move
+
+        # A win in one move ends the search of the position.
+        moves = self.ordered_moves(player, ply, table_move)
+        stride = bitboard.height + 1
+        for move in moves:
+            if self.line_counts.wins_at(bitboard.heights[move] - move * stride, move, player):
+                return WIN_SCORE - ply - 1, move
+        if depth == 0:
+            return evaluate(self.line_counts, player), NO_MOVE
+
+        best_value, best_move = -WIN_SCORE, moves[0]
+        for move in moves:
+            row = bitboard.heights[move] - move * stride
+            bitboard.play(move, player)
+            self.line_counts.add(row, move, player)
+            child_key = zobrist_update(key, row, move, player, bitboard.height, bitboard.length)
+            try:
+                value = -self.negamax(opponent(player), depth - 1, -beta, -alpha, ply + 1, child_key)[0]
+            finally:
+                bitboard.undo(move, player)
+                self.line_counts.remove(row, move, player)
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if move != self.killers[ply][0]:
+                    self.killers[ply] = [move, self.killers[ply][0]]
+                self.history[player, move] += depth * depth
+                break
+
+        if best_value <= alpha_original:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
         else:
-            heuristic_norm = 7 ** (state.depth+1)
-            new_heuristic = heuristic / heuristic_norm
-
-            # good value
-            if new_heuristic > state.heuristic_for_action[0]:
-                # saving heuristic we normalize it
-                state.max_heuristic_for_action = [state.heuristic_for_action[0]/heuristic_norm,
-                                                  state.heuristic_for_action[1]]
-                # prepare for checking other options
-                state.heuristic_for_action = [0, None]
-    # end of checking
-    if state.max_heuristic_for_action[1] is None:
-        # if You got here, it should be a lost game
-        from agents.agent_random.random import generate_move_random
-        return generate_move_random(state.board_5, player, None)
-    return state.max_heuristic_for_action[1], state
-    # TODO: check if the cases, when hypothetically we get a draw, don't lead here
+            flag = EXACT
+        stored = best_value + ply if best_value > WIN_THRESHOLD else best_value - ply \
+            if best_value < -WIN_THRESHOLD else best_value
+        self.table.store(key, depth, stored, flag, best_move)
+        return best_value, best_move
+
 
+def generate_move_minimax(
+        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+        max_depth: int = 8, time_limit_ms: Optional[float] = None, n: int = GameDim.CONNECT.value,
+        book: bool = True
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Iterative deepening negamax with alpha-beta pruning: depth 1, 2, ... max_depth are searched
+    one after another (each one orders its moves by what the previous ones stored), until
+    the depth or the time limit is reached, or a forced win or loss is found.
+    With a time limit, the best move of the last finished depth is played.
+    :param max_depth: the deepest search, in plies.
+    :param time_limit_ms: wall clock budget of the move (None: no limit, the result is deterministic).
+    :param n: numbers of pieces connected to win. The board may be of any size.
+    :param book: play the move of the opening book (see agents.opening_book), if the position is in it.
+    :return: the action and the saved state with the table, history and the statistics of the search.
+    """
+    if not isinstance(saved_state, SavedStateMinimax) or saved_state.history.shape[1] != board.shape[1]:
+        saved_state = SavedStateMinimax(board.shape[1])
+    bitboard = board_to_bitboard(board)
+    moves = bitboard.legal_moves()
+    if not moves:
+        raise Exception("No available action for the player", player)
+    if book:
+        entry = book_move(board, n)
+        if entry is not None:
+            saved_state.depth, saved_state.nodes, saved_state.value = 0, 0, entry[1]
+            return entry[0], saved_state
+
+    deadline = None if time_limit_ms is None else time.perf_counter() + time_limit_ms / 1000
+    search = Search(bitboard, saved_state, deadline, n)
+    key = zobrist_hash(board)
+    empty_cells = board.size - bitboard.moves
+
+    action, value, depth = center_first(bitboard.length)[0], 0, 0
+    action = action if action in moves else moves[0]
+    for depth in range(1, min(max_depth, empty_cells) + 1):
+        try:
+            value, best = search.negamax(player, depth, -WIN_SCORE, WIN_SCORE, 0, key)
+        except SearchTimeout:
+            depth -= 1
+            break
+        if best != NO_MOVE:
+            action = best
+        if abs(value) > WIN_THRESHOLD:
+            break
+
+    saved_state.depth, saved_state.nodes, saved_state.value = depth, search.nodes, value
+    return PlayerAction(action), saved_state
@@ -1,6 +1,6 @@
 import numpy as np
 from typing import Optional, Tuple
-from agents.common import lowest_free, BoardPiece, PlayerAction, SavedState
+from agents.common import lowest_free, BoardPiece, PlayerAction, SavedState, GameDim
 
 import timeit  # time checking
 #import cProfile  # for profiling executing di
@@ -12,10 +12,12 @@ import timeit  # time checking
 
 
 def generate_move_random(
-     board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]
+     board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+     n: int = GameDim.CONNECT.value
      ) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
     Choose a valid, non-full column randomly and return it as `action`.
+    n (pieces connected to win) is accepted like by the other agents, the random agent doesn't need it.
     """
     low_frees = np.zeros(board.shape[1])
     for j in range(board.shape[1]):
@@ -26,4 +28,4 @@ def generate_move_random(
         raise Exception("No available action for the player", player)
 
     action = np.random.choice(columns_free).astype(PlayerAction)
-    return action
+    return action, saved_state
@@ -0,0 +1,308 @@
+import os
+import time
+import numpy as np
+from typing import Optional, Tuple, Dict
+
+from agents.common import BoardPiece, PlayerAction, SavedState, GameDim, opponent
+from agents.bitboard import BitBoard, board_masks, winning_cells, mirror_key, board_to_bitboard, fits_in_64_bits
+from agents.transposition import TranspositionTable, UPPER_BOUND, LOWER_BOUND
+from agents.opening_book import BOOK_DTYPE
+from agents.agent_minimax.minimax import SearchTimeout, TIME_CHECK_NODES, center_first, generate_move_minimax
+
+
+# Exact solver: negamax with alpha-beta on the bitboard, the score is narrowed by null window searches.
+# The score of a position is for the player to move:
+#   - positive, if the player wins: (cells + 1 - moves) // 2 for a win with the next piece,
+#     (moves are the pieces on the board), so the sooner the win, the higher the score,
+#   - 0 for a draw,
+#   - negative, if the player loses (minus the score of the opponent's win).
+# The search keeps a position as two ints: the pieces of the player to move and the mask of all the pieces.
+# Playing a move swaps the point of view, the opponent's pieces are position ^ mask.
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(__file__), "cache")
+
+
+def default_cache_path(
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value, n: int = GameDim.CONNECT.value
+) -> str:
+    return os.path.join(CACHE_DIRECTORY, f"solved_{height}x{length}_{n}.npy")
+
+
+class SolvedCache:
+    """
+    Persistent cache of solved positions, {key: (best move, exact score)}. The file has the format
+    of the opening book (a sorted .npy of BOOK_DTYPE), so a cache can be used as a book as well.
+    Keys are BitBoard.key() of the position or of its mirror image, whichever is smaller.
+    """
+
+    def __init__(self, path: Optional[str] = None,
+                 height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value):
+        self.path = path
+        self.height = height
+        self.length = length
+        self.entries: Dict[int, Tuple[int, int]] = {}
+        self.new_entries = 0
+        if path is not None and os.path.exists(path):
+            for key, move, score in np.load(path).tolist():
+                self.entries[key] = (move, score)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, bitboard: BitBoard) -> Optional[Tuple[PlayerAction, int]]:
+        key = bitboard.key()
+        mirrored = mirror_key(key, self.height, self.length)
+        entry = self.entries.get(min(key, mirrored))
+        if entry is None:
+            return None
+        move, score = entry
+        return PlayerAction(self.length - 1 - move if mirrored < key else move), score
+
+    def put(self, bitboard: BitBoard, move: PlayerAction, score: int):
+        key = bitboard.key()
+        mirrored = mirror_key(key, self.height, self.length)
+        self.entries[min(key, mirrored)] = (int(self.length - 1 - move if mirrored < key else move), score)
+        self.new_entries += 1
+
+    def save(self):
+        """
+        Writes the cache, if anything was added. The file is replaced at once, so a killed run can't leave half a file.
+        """
+        if self.path is None or self.new_entries == 0:
+            return
+        entries = np.array([(key, move, score) for key, (move, score) in sorted(self.entries.items())],
+                           dtype=BOOK_DTYPE)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = self.path + ".tmp.npy"
+        np.save(temporary, entries)
+        os.replace(temporary, self.path)
+        self.new_entries = 0
+
+
+class Solver:
+    """
+    Solves positions of one variant of the game. The transposition table (upper and lower bounds
+    of the scores) is kept between the calls, and so is the cache of the solved root positions.
+    """
+
+    def __init__(self, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+                 n: int = GameDim.CONNECT.value, table_size_log2: int = 20, cache: Optional[SolvedCache] = None):
+        if not fits_in_64_bits(height, length):
+            raise ValueError("The keys of the board don't fit in 64 bits.")
+        self.height = height
+        self.length = length
+        self.n = n
+        self.cells = height * length
+        self.bottom, self.full, tops = board_masks(height, length)
+        self.column_masks = [((1 << height) - 1) << (j * (height + 1)) for j in range(length)]
+        self.order = center_first(length)
+        self.table = TranspositionTable(table_size_log2)
+        self.cache = cache
+        self.nodes = 0
+        self.deadline: Optional[float] = None
+
+    def winning(self, position: int, mask: int) -> int:
+        """
+        Empty cells, which would complete a line of the position's pieces.
+        """
+        return winning_cells(position, self.height, self.length, self.n) & ~mask
+
+    def possible(self, mask: int) -> int:
+        """
+        The cells, where the next piece of every column lands.
+        """
+        return (mask + self.bottom) & self.full
+
+    def non_losing_moves(self, position: int, mask: int) -> int:
+        """
+        The possible moves, after which the opponent can't win at once (0, if there are none).
+        A single threat of the opponent has to be blocked, the cell below a threat must not be played.
+        """
+        possible = self.possible(mask)
+        opponent_wins = self.winning(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return 0  # two threats, one can't block both
+            possible = forced
+        return possible & ~(opponent_wins >> 1)
+
+    def negamax(self, position: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """
+        Alpha-beta for the player to move, who can't win with the next piece.
+        :return: the exact score within (alpha, beta), an upper bound if it's <= alpha, a lower bound if >= beta.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % TIME_CHECK_NODES == 0 \
+                and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        next_moves = self.non_losing_moves(position, mask)
+        if not next_moves:
+            return -((self.cells - moves) // 2)
+        if moves >= self.cells - 2:
+            return 0
+
+        lower = -((self.cells - 2 - moves) // 2)  # the opponent can't win with the next piece
+        upper = (self.cells - 1 - moves) // 2  # nor the player
+        key = position + mask
+        entry = self.table.probe(key)
+        if entry is not None:
+            if entry[2] == UPPER_BOUND:
+                upper = min(upper, entry[1])
+            elif entry[2] == LOWER_BOUND:
+                lower = max(lower, entry[1])
+        alpha, beta = max(alpha, lower), min(beta, upper)
+        if alpha >= beta:
+            return alpha
+
+        # Moves creating the most threats first (ties stay center first).
+        candidates = []
+        for j in self.order:
+            move = next_moves & self.column_masks[j]
+            if move:
+                candidates.append((-bin(self.winning(position | move, mask)).count("1"), len(candidates), move))
+        candidates.sort()
+
+        opponent_position = position ^ mask
+        for threats, index, move in candidates:
+            score = -self.negamax(opponent_position, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self.table.store(key, self.cells - moves, score, LOWER_BOUND)
+                return score
+            alpha = max(alpha, score)
+        self.table.store(key, self.cells - moves, alpha, UPPER_BOUND)
+        return alpha
+
+    def _solve(self, position: int, mask: int, moves: int) -> int:
+        """
+        The exact score by null window searches: is the score above med? The window [low, high] halves each time,
+        with med pulled towards 0 first, since most positions are close to a draw.
+        """
+        if self.winning(position, mask) & self.possible(mask):
+            return (self.cells + 1 - moves) // 2
+        low, high = -((self.cells - moves) // 2), (self.cells + 1 - moves) // 2
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and int(low / 2) < med:
+                med = int(low / 2)
+            elif med >= 0 and int(high / 2) > med:
+                med = int(high / 2)
+            result = self.negamax(position, mask, moves, med, med + 1)
+            if result <= med:
+                high = result
+            else:
+                low = result
+        return low
+
+    def solve(self, bitboard: BitBoard, player: BoardPiece) -> int:
+        """
+        :return: the exact score of the position for the player to move.
+        """
+        if self.cache is not None:
+            entry = self.cache.get(bitboard)
+            if entry is not None:
+                return entry[1]
+        return self._solve(bitboard.pieces[player - 1], bitboard.mask, bitboard.moves)
+
+    def best_move(self, bitboard: BitBoard, player: BoardPiece) -> Tuple[PlayerAction, int]:
+        """
+        Solves every move of the player and picks the highest score (center first among equal ones).
+        The result goes to the cache.
+        :return: the move and the exact score of the position.
+        """
+        if self.cache is not None:
+            entry = self.cache.get(bitboard)
+            if entry is not None:
+                return entry
+        position, mask, moves = bitboard.pieces[player - 1], bitboard.mask, bitboard.moves
+        possible, non_losing = self.possible(mask), self.non_losing_moves(position, mask)
+        wins = self.winning(position, mask) & possible
+
+        best, best_score = None, None
+        for j in self.order:
+            move = possible & self.column_masks[j]
+            if not move:
+                continue
+            if wins & move:
+                best, best_score = j, (self.cells + 1 - moves) // 2
+                break
+            if move & non_losing:
+                child = bitboard.copy()
+                child.play(j, player)
+                score = -self.solve(child, opponent(player))
+            else:
+                score = -((self.cells - moves) // 2)  # the opponent wins with the next piece
+            if best_score is None or score > best_score:
+                best, best_score = j, score
+
+        if self.cache is not None:
+            self.cache.put(bitboard, best, best_score)
+        return PlayerAction(best), best_score
+
+
+class SavedStateSolver(SavedState):
+    def __init__(self, solver: Solver):
+        """
+        The solver with its table and cache, and the result of the last move:
+        the exact score (None, when the position wasn't solved in time) and the nodes searched.
+        """
+        self.solver = solver
+        self.score: Optional[int] = None
+        self.nodes = 0
+
+
+def generate_move_solver(
+        board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+        time_limit_ms: Optional[float] = None, n: int = GameDim.CONNECT.value, cache: bool = True
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Perfect play: the move with the best exact score (the fastest win, a draw, or the slowest loss).
+    Early positions of the full board take very long to solve in Python, so with a time limit
+    a position not solved in time is played by minimax in the rest of the time (saved_state.score is None then).
+    Boards, which don't fit in 64 bits, are always played by minimax.
+    :param time_limit_ms: wall clock budget of the move (None: solve, however long it takes).
+    :param n: numbers of pieces connected to win.
+    :param cache: keep the solved positions in the cache file (default_cache_path), which warms across runs.
+    :return: the action and the saved state with the solver and the score.
+    """
+    start = time.perf_counter()
+    if not fits_in_64_bits(*board.shape):
+        return generate_move_minimax(board, player, None, time_limit_ms=time_limit_ms, n=n)
+    if not isinstance(saved_state, SavedStateSolver) or saved_state.solver.n != n \
+            or (saved_state.solver.height, saved_state.solver.length) != board.shape:
+        solved_cache = SolvedCache(default_cache_path(*board.shape, n), *board.shape) if cache else None
+        saved_state = SavedStateSolver(Solver(*board.shape, n, cache=solved_cache))
+    solver = saved_state.solver
+    bitboard = board_to_bitboard(board)
+    if not bitboard.legal_moves():
+        raise Exception("No available action for the player", player)
+
+    solver.nodes = 0
+    solver.deadline = None if time_limit_ms is None else start + time_limit_ms / 1000
+    try:
+        action, saved_state.score = solver.best_move(bitboard, player)
+    except SearchTimeout:
+        remaining_ms = max(time_limit_ms - (time.perf_counter() - start) * 1000, 1.)
+        action = generate_move_minimax(board, player, None, time_limit_ms=remaining_ms, n=n)[0]
+        saved_state.score = None
+    saved_state.nodes = solver.nodes
+    if solver.cache is not None:
+        solver.cache.save()
+    return action, saved_state
+
+
+def solve_move(board: np.ndarray, player: BoardPiece, n: int = GameDim.CONNECT.value,
+               time_limit_ms: Optional[float] = None, table_size_log2: int = 16) -> Optional[Tuple[PlayerAction, int]]:
+    """
+    Exact move and score of a position with a fresh solver (without a cache), e.g. for the endgame of MCTS.
+    :return: None, if the position wasn't solved within the time limit.
+    """
+    height, length = board.shape
+    if not fits_in_64_bits(height, length):
+        return None
+    solver = Solver(height, length, n, table_size_log2)
+    solver.deadline = None if time_limit_ms is None else time.perf_counter() + time_limit_ms / 1000
+    try:
+        return solver.best_move(board_to_bitboard(board), player)
+    except SearchTimeout:
+        return None
@@ -0,0 +1,225 @@
+import numpy as np
+from functools import lru_cache
+from typing import List, Tuple
+from agents.common import BoardPiece, PlayerAction, GameDim, GameState, NO_PLAYER, PLAYER1, PLAYER2
+
+
+# Bitboard layout (for the default 6x7 board), bits are numbered column by column from the bottom.
+# Every column gets one spare bit on top, so that shifting never wraps a line into the next column:
+#
+#   .  .  .  .  .  .  .
+#   5 12 19 26 33 40 47
+#   4 11 18 25 32 39 46
+#   3 10 17 24 31 38 45
+#   2  9 16 23 30 37 44
+#   1  8 15 22 29 36 43
+#   0  7 14 21 28 35 42
+
+
+# The masks are Python ints, so any board size works. Boards with (height + 1) * length <= 64
+# also fit in 64 bit integers (np.uint64), which the array based code (FlatTree) relies on.
+
+
+def fits_in_64_bits(height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value) -> bool:
+    """
+    Do the masks of the board (with the spare bit of every column) fit in 64 bits?
+    """
+    return (height + 1) * length <= 64
+
+
+@lru_cache(maxsize=None)
+def board_masks(height: int, length: int) -> Tuple[int, int, Tuple[int, ...]]:
+    """
+    Masks depending only on the board dimensions, computed once per dimension.
+    :return: bottom mask (lowest cell of every column), full mask (all the playable cells)
+     and a tuple with the index of the spare bit on top of every column.
+    """
+    bottom = sum(1 << (j * (height + 1)) for j in range(length))
+    full = bottom * ((1 << height) - 1)
+    tops = tuple(j * (height + 1) + height for j in range(length))
+    return bottom, full, tops
+
+
+def connected(bits: int, height: int = GameDim.HEIGHT.value, n: int = GameDim.CONNECT.value) -> bool:
+    """
+    Shift-and-AND win detection: are there n pieces in a line in the mask of one player?
+    Shifts by 1, height + 1, height and height + 2 follow vertical, horizontal and both diagonal lines.
+    :param bits: mask of the pieces of one player.
+    :param height: height of the board the mask comes from.
+    :param n: numbers of pieces connected. Four by default.
+    """
+    for shift in (1, height + 1, height, height + 2):
+        line = bits
+        for k in range(1, n):
+            line &= bits >> (k * shift)
+        if line:
+            return True
+    return False
+
+
+def winning_cells(bits: int, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+                  n: int = GameDim.CONNECT.value) -> int:
+    """
+    Cells (of the board, occupied or not), which would complete n in a line for the owner of `bits`.
+    For every direction and every position of the gap in the line, the other n-1 pieces are shifted onto the gap.
+    """
+    cells = 0
+    for shift in (1, height + 1, height, height + 2):
+        for gap in range(n):
+            line = -1
+            for i in range(n):
+                if i != gap:
+                    distance = (i - gap) * shift
+                    line &= bits >> distance if distance > 0 else bits << -distance
+            cells |= line
+    return cells & board_masks(height, length)[1]
+
+
+class BitBoard:
+    """
+    Bitboard state of the game: two masks (one per player) plus per-column heights.
+    Moves are applied in O(1), legal moves come from the heights and wins are found with shifts.
+    pieces[player - 1] is the mask of the player's pieces.
+    heights[j] is the index of the bit, where the next piece in the column j lands.
+    """
+    __slots__ = ("height", "length", "pieces", "heights", "moves")
+
+    def __init__(self, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value):
+        self.height = height
+        self.length = length
+        self.pieces = [0, 0]
+        self.heights = [j * (height + 1) for j in range(length)]
+        self.moves = 0
+
+    @property
+    def mask(self) -> int:
+        return self.pieces[0] | self.pieces[1]
+
+    def copy(self) -> 'BitBoard':
+        new = BitBoard.__new__(BitBoard)
+        new.height = self.height
+        new.length = self.length
+        new.pieces = self.pieces.copy()
+        new.heights = self.heights.copy()
+        new.moves = self.moves
+        return new
+
+    def can_play(self, action: PlayerAction) -> bool:
+        return self.heights[action] != board_masks(self.height, self.length)[2][action]
+
+    def play(self, action: PlayerAction, player: BoardPiece) -> int:
+        """
+        Puts the player's piece on top of the column "action", without checking if it's free.
+        :return: the bit of the new piece.
+        """
+        bit = 1 << self.heights[action]
+        self.pieces[player - 1] |= bit
+        self.heights[action] += 1
+        self.moves += 1
+        return bit
+
+    def undo(self, action: PlayerAction, player: BoardPiece):
+        """
+        Takes back the player's piece from the top of the column "action".
+        """
+        self.heights[action] -= 1
+        self.pieces[player - 1] ^= 1 << self.heights[action]
+        self.moves -= 1
+
+    def legal_moves_mask(self) -> int:
+        """
+        Mask of the cells, where the next piece in every (not full) column would land.
+        """
+        bottom, full, _ = board_masks(self.height, self.length)
+        return (self.mask + bottom) & full
+
+    def legal_moves(self) -> List[int]:
+        """
+        The columns still available, in increasing order.
+        """
+        tops = board_masks(self.height, self.length)[2]
+        return [j for j, h in enumerate(self.heights) if h != tops[j]]
+
+    def is_win(self, player: BoardPiece, n: int = GameDim.CONNECT.value) -> bool:
+        return connected(self.pieces[player - 1], self.height, n)
+
+    def is_full(self) -> bool:
+        return self.moves == self.height * self.length
+
+    def end_state(self, player: BoardPiece, n: int = GameDim.CONNECT.value) -> GameState:
+        """
+        Same as check_end_state of agents.common: has the last action of `player` won or drawn the game?
+        """
+        if self.is_win(player, n):
+            return GameState.IS_WIN
+        if self.is_full():
+            return GameState.IS_DRAW
+        return GameState.STILL_PLAYING
+
+    def key(self) -> int:
+        """
+        Unique integer of the position: the pieces of player 1 plus a single bit on top of every column.
+        """
+        return self.pieces[0] + self.mask + board_masks(self.height, self.length)[0]
+
+
+def mirror_key(key: int, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value) -> int:
+    """
+    The key of the mirrored position (column j becomes length - 1 - j).
+    The key has a block of height + 1 bits per column, so the blocks are just reversed.
+    """
+    column = (1 << (height + 1)) - 1
+    mirrored = 0
+    for j in range(length):
+        mirrored |= ((key >> (j * (height + 1))) & column) << ((length - 1 - j) * (height + 1))
+    return mirrored
+
+
+def bitboard_from_pieces(
+        pieces_1: int, pieces_2: int,
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value
+) -> BitBoard:
+    """
+    Rebuilds the BitBoard from the masks of both players (heights are recovered from their union).
+    """
+    bitboard = BitBoard(height, length)
+    bitboard.pieces = [int(pieces_1), int(pieces_2)]
+    mask = bitboard.mask
+    column = (1 << height) - 1
+    for j in range(length):
+        bitboard.heights[j] += ((mask >> (j * (height + 1))) & column).bit_length()
+    bitboard.moves = bin(mask).count("1")
+    return bitboard
+
+
+def board_to_bitboard(board: np.ndarray) -> BitBoard:
+    """
+    Converts the ndarray board (board[0, 0] in the lower-left) to a BitBoard.
+    Column heights are counted as in lowest_free.
+    """
+    height, length = board.shape
+    bitboard = BitBoard(height, length)
+    for player in (PLAYER1, PLAYER2):
+        rows, columns = np.nonzero(board == player)
+        for i, j in zip(rows.tolist(), columns.tolist()):
+            bitboard.pieces[player - 1] |= 1 << (j * (height + 1) + i)
+    counts = np.count_nonzero(board, axis=0).tolist()
+    for j in range(length):
+        bitboard.heights[j] += counts[j]
+    bitboard.moves = sum(counts)
+    return bitboard
+
+
+def bitboard_to_board(bitboard: BitBoard) -> np.ndarray:
+    """
+    Converts a BitBoard back to the ndarray board of BoardPiece data type.
+    """
+    board = np.full((bitboard.height, bitboard.length), NO_PLAYER, dtype=BoardPiece)
+    for player in (PLAYER1, PLAYER2):
+        bits = bitboard.pieces[player - 1]
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            board[index % (bitboard.height + 1), index // (bitboard.height + 1)] = player
+            bits ^= low
+    return board
@@ -1,6 +1,7 @@
 import numpy as np
 from enum import Enum
-from typing import Optional, Callable, Tuple
+from functools import lru_cache
+from typing import Optional, Callable, Tuple, List
 from scipy.signal import convolve2d
 
 
@@ -33,13 +34,14 @@ class GameState(Enum):
     STILL_PLAYING = 0
 
 
-def initialize_game_state() -> np.ndarray:
+def initialize_game_state(
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value
+) -> np.ndarray:
     """
-    Returns an ndarray, shape (6, 7)
+    Returns an ndarray, shape (height, length), (6, 7) by default,
     and data type (dtype) BoardPiece, initialized to 0 (NO_PLAYER)
     """
-    board = np.zeros((6, 7), dtype=BoardPiece)
-    # Remark: since you've defined the parameters in an enumeration class (GameDimensions), why not use them here?
+    board = np.zeros((height, length), dtype=BoardPiece)
     return board
 
 
@@ -48,6 +50,7 @@ def pretty_print_board(board: np.ndarray) -> str:
     Human readable string representation of the board.
     To play and do diagnostics to the console (stdout).
     The piece board[0, 0] should appear in the lower-left.
+    Every cell takes two characters, the columns are numbered modulo 10 at the bottom.
     Just an example:
     |==============|
     |              |
@@ -59,18 +62,19 @@ def pretty_print_board(board: np.ndarray) -> str:
     |==============|
     |0 1 2 3 4 5 6 |
     """
+    height, length = board.shape
     minus_board = np.flip(board, axis=0)
     pp_board = ''
 
-    for i in np.arange(42):
-        if i % 7 == 0:
+    for i in np.arange(height * length):
+        if i % length == 0:
             pp_board = pp_board + '|\n|'
-        pp_board = pp_board + str(minus_board[i // 7, i % 7]) + ' '
+        pp_board = pp_board + str(minus_board[i // length, i % length]) + ' '
     mapping_0 = [('0', NO_PLAYER_PRINT), ('1', PLAYER1_PRINT), ('2', PLAYER2_PRINT)]
     for k, v in mapping_0:
         pp_board = pp_board.replace(k, v)
-    cardinals = '0 1 2 3 4 5 6 '
-    pp_board = ("|" + 14*'=') + pp_board + ('|\n|' + 14*'=') + ('|\n|' + cardinals) + '|'
+    cardinals = ''.join(f'{j % 10} ' for j in range(length))
+    pp_board = ("|" + 2*length*'=') + pp_board + ('|\n|' + 2*length*'=') + ('|\n|' + cardinals) + '|'
     return pp_board
 
 
@@ -79,20 +83,21 @@ def string_to_board(pp_board: str) -> np.ndarray:
     Takes the output of pretty_print_board and turns back to ndarray.
     This is quite useful for debugging, when the agent crashed and you have the last
     board state as a string.
+    The dimensions are read from the string: the rows between the '=' lines, two characters per cell.
     """
     # maydo: replace '0', '1',... with class player value
     mapping_inverse = np.array([('0', NO_PLAYER_PRINT), ('1', PLAYER1_PRINT), ('2', PLAYER2_PRINT)], str)
     mapping_inverse[:, [0, 1]] = mapping_inverse[:, [1, 0]]
 
-    still_a_str = pp_board.replace('|', '')
-    for (k, v) in mapping_inverse:
-        still_a_str = still_a_str.replace(k, v)
-
-    surged_str = still_a_str.split('\n')[1:7]  # check
-    surged_string_array = np.zeros((6, 7), dtype=str)
-    for i in range(GameDim.HEIGHT.value):
-        row = list(surged_str[i])[::2]
-        surged_string_array[i, :] = np.array(row)
+    lines = pp_board.split('\n')
+    surged_str = lines[1:len(lines) - 2]  # without the '=' lines and the column numbers
+    height, length = len(surged_str), len(lines[0].strip('|')) // 2
+    surged_string_array = np.zeros((height, length), dtype=str)
+    for i in range(height):
+        row = surged_str[i].replace('|', '')
+        for (k, v) in mapping_inverse:
+            row = row.replace(k, v)
+        surged_string_array[i, :] = np.array(list(row)[::2])
 
     reboard = surged_string_array.astype(BoardPiece)
     reboard = np.flip(reboard, axis=0)
@@ -111,39 +116,51 @@ def lowest_free(board: np.ndarray, action: PlayerAction) -> int:
 
 def apply_player_action(
         board: np.ndarray, action: PlayerAction,
-        player: BoardPiece, copy: bool = False
+        player: BoardPiece, copy: bool = False,
+        line_counts: Optional['LineCounts'] = None
 ) -> np.ndarray:
     """
     Sets board[i, action] = player, where i is the lowest open row for the column with the number "action". The modified
     board is returned. If copy is True, makes a copy of the board before modifying it.
+    If line_counts of the board are given, they are updated with the new piece.
     """
+    i = lowest_free(board, action)
+    if line_counts is not None:
+        line_counts.add(i, action, player)
     if copy is True:
         copy_of_the_board = np.copy(board)
-        copy_of_the_board[lowest_free(board, action), action] = player
+        copy_of_the_board[i, action] = player
         return copy_of_the_board
     else:
-        i = lowest_free(board, action)
         board[i, action] = player
         return board
 
 
-def connect(board: np.ndarray, player: BoardPiece, n=4) -> bool:
+@lru_cache(maxsize=None)
+def connect_kernels(n: int = GameDim.CONNECT.value) -> Tuple[np.ndarray, ...]:
+    """
+    Kernels of the four directions (horizontal, vertical, both diagonals), built once per n.
+    """
+    four = np.ones((1, n))
+    return four, four.T, np.eye(n), np.fliplr(np.eye(n))
+
+
+def connect(board: np.ndarray, player: BoardPiece, n: int = GameDim.CONNECT.value) -> bool:
     """
     Using scipy convolve2d.
     :param board: array to check for connected pieces.
     :param player: the one that just moved, ie the board piece to check.
-    :param n: numbers of pieces connected. Here it's four.
-    :return: boolean: is there four connected pieces or not.
+    :param n: numbers of pieces connected. Four by default.
+    :return: boolean: is there n connected pieces or not.
     """
-    four = np.ones((1, n))
-    four_connected = [four, four.T, np.diag(four.flatten()), np.fliplr(np.diag(four.reshape(4)))]
-
     # Convolution of kernel and the board will reveal connectedness.
     if player == BoardPiece(1):
         # It's important to exclude summing board pieces of nr two.
         board = np.where(board== 1, board, 0)
 
-    for kernel in four_connected:
+    for kernel in connect_kernels(n):
+        if kernel.shape[0] > board.shape[0] or kernel.shape[1] > board.shape[1]:
+            continue  # no line of that direction fits on the board
         convolution = convolve2d(board, kernel, "valid")
         is_connected = (convolution == player * n).any()
         if is_connected:
@@ -152,22 +169,177 @@ def connect(board: np.ndarray, player: BoardPiece, n=4) -> bool:
     return False
 
 
+def connect_last_action(
+        board: np.ndarray, player: BoardPiece, last_action: PlayerAction, n: int = GameDim.CONNECT.value
+) -> bool:
+    """
+    Checks only the four lines (horizontal, vertical and two diagonals) through the piece on top of
+    the column last_action, instead of scanning the whole board.
+    :param board: array to check for connected pieces.
+    :param player: the one that just moved, ie the board piece to check.
+    :param last_action: the column, where the player put the last piece.
+    :param n: numbers of pieces connected. Here it's four.
+    :return: boolean: is there four connected pieces through the last piece or not.
+    """
+    height, length = board.shape
+    row = lowest_free(board, last_action) - 1
+    if row < 0 or board[row, last_action] != player:
+        # The top of the column is not the player's piece, so the last action is unknown after all.
+        return connect(board, player, n)
+
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            i, j = row + sign * d_row, last_action + sign * d_col
+            while 0 <= i < height and 0 <= j < length and board[i, j] == player and count < n:
+                count += 1
+                i, j = i + sign * d_row, j + sign * d_col
+        if count >= n:
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def win_lines(height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+              n: int = GameDim.CONNECT.value) -> np.ndarray:
+    """
+    All the lines of n cells, where a player can win. For the 6x7 board and n = 4 there are 69 of them:
+    24 horizontal, 21 vertical and 12 for every diagonal direction.
+    :return: array of shape (number of lines, n, 2), the (row, column) of every cell of every line.
+    """
+    lines = []
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for row in range(height):
+            for col in range(length):
+                end_row, end_col = row + (n - 1) * d_row, col + (n - 1) * d_col
+                if 0 <= end_row < height and 0 <= end_col < length:
+                    lines.append([(row + k * d_row, col + k * d_col) for k in range(n)])
+    return np.array(lines, dtype=np.intp)
+
+
+@lru_cache(maxsize=None)
+def cell_lines(height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+               n: int = GameDim.CONNECT.value) -> List[List[np.ndarray]]:
+    """
+    Cell-to-lines index: cell_lines(...)[row][col] are the indices (to win_lines) of the lines through the cell.
+    """
+    index = [[[] for col in range(length)] for row in range(height)]
+    for line, cells in enumerate(win_lines(height, length, n)):
+        for row, col in cells:
+            index[row][col].append(line)
+    return [[np.array(lines, dtype=np.intp) for lines in row] for row in index]
+
+
+class LineCounts:
+    """
+    Incremental count of the pieces of every player in every line of win_lines:
+    counts[player][line]. A piece updates only the lines through its cell (at most 13 on the 6x7 board),
+    so wins and threats are found without scanning the board.
+    With weights (weights[k] for a line with k pieces of one player and none of the other),
+    the static score of the board is kept up to date the same way.
+    The counts are plain lists, for a dozen lines they are faster than numpy indexing.
+    """
+    __slots__ = ("n", "lines", "counts", "line_values", "balance")
+
+    def __init__(self, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+                 n: int = GameDim.CONNECT.value, weights: Optional[np.ndarray] = None):
+        self.n = n
+        self.lines = [[lines.tolist() for lines in row] for row in cell_lines(height, length, n)]
+        nr_of_lines = len(win_lines(height, length, n))
+        self.counts = [[0] * nr_of_lines for player in range(3)]
+        # line_values[pieces of player 1][pieces of player 2]: the value of a line for player 1.
+        self.line_values = [[0] * (n + 1) for k in range(n + 1)]
+        if weights is not None:
+            for k in range(1, n):
+                self.line_values[k][0] = int(weights[k])
+                self.line_values[0][k] = -int(weights[k])
+        self.balance = 0  # the score of player 1
+
+    @classmethod
+    def from_board(cls, board: np.ndarray, n: int = GameDim.CONNECT.value,
+                   weights: Optional[np.ndarray] = None) -> 'LineCounts':
+        line_counts = cls(*board.shape, n, weights)
+        cells = win_lines(*board.shape, n)
+        pieces = board[cells[:, :, 0], cells[:, :, 1]]
+        for player in (PLAYER1, PLAYER2):
+            line_counts.counts[player] = (pieces == player).sum(axis=1).tolist()
+        line_counts.balance = line_counts._lines_value(range(len(cells)))
+        return line_counts
+
+    def _lines_value(self, lines) -> int:
+        values, mine, theirs = self.line_values, self.counts[PLAYER1], self.counts[PLAYER2]
+        return sum([values[mine[line]][theirs[line]] for line in lines])
+
+    def add(self, row: int, col: int, player: BoardPiece) -> bool:
+        """
+        Counts the new piece of the player.
+        :return: has the piece completed a line (won)?
+        """
+        lines, counts = self.lines[row][col], self.counts[player]
+        before = self._lines_value(lines)
+        won = False
+        for line in lines:
+            counts[line] += 1
+            won = won or counts[line] == self.n
+        self.balance += self._lines_value(lines) - before
+        return won
+
+    def remove(self, row: int, col: int, player: BoardPiece):
+        lines, counts = self.lines[row][col], self.counts[player]
+        before = self._lines_value(lines)
+        for line in lines:
+            counts[line] -= 1
+        self.balance += self._lines_value(lines) - before
+
+    def wins_at(self, row: int, col: int, player: BoardPiece) -> bool:
+        """
+        Would a piece of the player at (row, col) complete a line?
+        """
+        counts, three = self.counts[player], self.n - 1
+        return any(counts[line] == three for line in self.lines[row][col])
+
+    def is_win(self, player: BoardPiece) -> bool:
+        return self.n in self.counts[player]
+
+    def open_lines(self, player: BoardPiece, k: int) -> int:
+        """
+        Number of lines with k pieces of the player and none of the opponent (k = n-1: open threes).
+        """
+        theirs = self.counts[opponent(player)]
+        return sum(1 for line, count in enumerate(self.counts[player]) if count == k and theirs[line] == 0)
+
+    def score(self, player: BoardPiece) -> int:
+        """
+        Static evaluation by the weights: the value of the lines still open to the player
+        minus the value of the lines open to the opponent.
+        """
+        return self.balance if player == PLAYER1 else -self.balance
+
+
 def check_end_state(
         board: np.ndarray, player: BoardPiece,
-        last_action: Optional[PlayerAction] = None
+        last_action: Optional[PlayerAction] = None, n: int = GameDim.CONNECT.value
 ) -> GameState:
     """
     Returns the current game state for the current `player`, i.e. has their last
     action won (GameState.IS_WIN) or drawn (GameState.IS_DRAW) the game,
     or is the play on-going (GameState.STILL_PLAYING)?
+    If last_action is given, only the lines through the last piece are checked
+    and the board is full, when its top row is full.
+    n is the number of pieces in a line, which wins.
     """
-    # maydo: continue with TEST and design of this function.
     game_state = GameState.STILL_PLAYING
 
-    if connect(board, player):
-        game_state = GameState.IS_WIN
-    elif (board != 0).all():
-        game_state = GameState.IS_DRAW
+    if last_action is None:
+        if connect(board, player, n):
+            game_state = GameState.IS_WIN
+        elif (board != 0).all():
+            game_state = GameState.IS_DRAW
+    else:
+        if connect_last_action(board, player, last_action, n):
+            game_state = GameState.IS_WIN
+        elif (board[-1] != 0).all():
+            game_state = GameState.IS_DRAW
     return game_state
 
 
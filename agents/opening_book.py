@@ -0,0 +1,190 @@
+import os
+import argparse
+import numpy as np
+from typing import Optional, Tuple, Callable, Dict
+
+from agents.common import BoardPiece, PlayerAction, GameDim, GameState, PLAYER1, PLAYER2
+from agents.bitboard import BitBoard, board_to_bitboard, bitboard_to_board, fits_in_64_bits, mirror_key
+
+
+# Opening book: the best move and the score of every position up to some number of plies.
+# The book is a sorted array of entries (key, move, score), saved as .npy, so that it can be memory-mapped
+# and binary-searched without reading the whole file. The key is BitBoard.key() of the position or of
+# its mirror image, whichever is smaller: mirrored positions share the entry (the move is mirrored back).
+# The score is for the player to move, in the units of the evaluator.
+
+BOOK_DTYPE = np.dtype([("key", "<u8"), ("move", "i1"), ("score", "<i4")])
+BOOK_DIRECTORY = os.path.join(os.path.dirname(__file__), "books")
+
+Evaluator = Callable[[np.ndarray, BoardPiece, int], Tuple[PlayerAction, int]]
+
+
+def default_book_path(
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value, n: int = GameDim.CONNECT.value
+) -> str:
+    """
+    Every variant of the game has its own book, e.g. books/opening_book_6x7_4.npy.
+    """
+    return os.path.join(BOOK_DIRECTORY, f"opening_book_{height}x{length}_{n}.npy")
+
+
+def canonical_key(bitboard: BitBoard) -> Tuple[int, bool]:
+    """
+    :return: the smaller of the keys of the position and its mirror image, and whether it's the mirrored one.
+    """
+    key = bitboard.key()
+    mirrored = mirror_key(key, bitboard.height, bitboard.length)
+    return (mirrored, True) if mirrored < key else (key, False)
+
+
+class OpeningBook:
+    """
+    Lookup in a book file, memory-mapped (only the pages touched by the binary search are read).
+    """
+
+    def __init__(self, path: str, length: int = GameDim.LENGTH.value):
+        self.path = path
+        self.length = length
+        self.entries = np.load(path, mmap_mode="r")
+        self.keys = self.entries["key"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, bitboard: BitBoard) -> Optional[Tuple[PlayerAction, int]]:
+        """
+        :return: the best move and its score for the player to move, None if the position is not in the book.
+        """
+        key, mirrored = canonical_key(bitboard)
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i == len(self.keys) or int(self.keys[i]) != key:
+            return None
+        move, score = int(self.entries[i]["move"]), int(self.entries[i]["score"])
+        return PlayerAction(self.length - 1 - move if mirrored else move), score
+
+
+_books: Dict[str, OpeningBook] = {}
+
+
+def get_book(
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value, n: int = GameDim.CONNECT.value
+) -> Optional[OpeningBook]:
+    """
+    The book of the variant, opened once per process. None, when there is no book file (yet).
+    """
+    path = default_book_path(height, length, n)
+    if path not in _books and os.path.exists(path):
+        _books[path] = OpeningBook(path, length)
+    return _books.get(path)
+
+
+def book_move(board: np.ndarray, n: int = GameDim.CONNECT.value) -> Optional[Tuple[PlayerAction, int]]:
+    """
+    Consults the book of the board's variant (used by the agents before searching).
+    :return: the move and the score, None if there is no book or the position is not in it.
+    """
+    if not fits_in_64_bits(*board.shape):
+        return None
+    book = get_book(*board.shape, n)
+    if book is None:
+        return None
+    return book.lookup(board_to_bitboard(board))
+
+
+def minimax_evaluator(max_depth: int = 10) -> Evaluator:
+    """
+    Evaluator of the generator: generate_move_minimax with the given depth.
+    The book is as good as the evaluator, a depth limited search doesn't solve the positions.
+    """
+    def evaluate(board: np.ndarray, player: BoardPiece, n: int) -> Tuple[PlayerAction, int]:
+        from agents.agent_minimax.minimax import generate_move_minimax
+        action, saved_state = generate_move_minimax(board, player, None, max_depth=max_depth, n=n, book=False)
+        return action, saved_state.value
+    return evaluate
+
+
+def solver_evaluator() -> Evaluator:
+    """
+    Evaluator of the generator: the exact solver (agents.agent_solver), for a perfect book.
+    Early positions of the 6x7 board take very long to solve in Python, it suits the last plies of a book
+    or smaller variants.
+    """
+    def evaluate(board: np.ndarray, player: BoardPiece, n: int) -> Tuple[PlayerAction, int]:
+        from agents.agent_solver.solver import generate_move_solver
+        action, saved_state = generate_move_solver(board, player, None, n=n, cache=False)
+        return action, saved_state.score
+    return evaluate
+
+
+def book_positions(
+        plies: int, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+        n: int = GameDim.CONNECT.value
+) -> Dict[int, Tuple[BitBoard, bool]]:
+    """
+    All the positions with at most `plies` pieces, which are still playing, one per mirror pair.
+    :return: {canonical key: (bitboard, whether the canonical key is of the mirror image)}
+    """
+    positions = {}
+    layer = [BitBoard(height, length)]
+    for ply in range(plies + 1):
+        next_layer = []
+        for bitboard in layer:
+            key, mirrored = canonical_key(bitboard)
+            if key in positions:
+                continue
+            positions[key] = (bitboard, mirrored)
+            if ply == plies:
+                continue
+            player = PLAYER1 if bitboard.moves % 2 == 0 else PLAYER2
+            for action in bitboard.legal_moves():
+                child = bitboard.copy()
+                child.play(action, player)
+                if child.end_state(player, n) == GameState.STILL_PLAYING:
+                    next_layer.append(child)
+        layer = next_layer
+    return positions
+
+
+def generate_book(
+        plies: int, evaluator: Optional[Evaluator] = None, path: Optional[str] = None,
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value, n: int = GameDim.CONNECT.value,
+        verbose: bool = False
+) -> np.ndarray:
+    """
+    Offline generator: evaluates every position up to `plies` pieces and writes the sorted book.
+    :param evaluator: evaluator(board, player, n) -> (best move, score for the player), minimax by default.
+    :param path: where the book is saved (default_book_path by default).
+    :return: the entries of the book.
+    """
+    if not fits_in_64_bits(height, length):
+        raise ValueError("The keys of the board don't fit in 64 bits.")
+    evaluator = minimax_evaluator() if evaluator is None else evaluator
+    positions = book_positions(plies, height, length, n)
+
+    entries = np.zeros(len(positions), dtype=BOOK_DTYPE)
+    for i, (key, (bitboard, mirrored)) in enumerate(sorted(positions.items())):
+        player = PLAYER1 if bitboard.moves % 2 == 0 else PLAYER2
+        move, score = evaluator(bitboard_to_board(bitboard), player, n)
+        entries[i] = (key, length - 1 - move if mirrored else move, score)
+        if verbose:
+            print(f"{i + 1}/{len(positions)}: ply {bitboard.moves}, move {move}, score {score}")
+
+    path = default_book_path(height, length, n) if path is None else path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, entries)
+    _books.pop(path, None)
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates the opening book.")
+    parser.add_argument("-p", "--plies", type=int, default=4, help="positions with up to that many pieces")
+    parser.add_argument("-d", "--depth", type=int, default=10, help="depth of the minimax evaluator")
+    parser.add_argument("--solver", action="store_true", help="evaluate by the exact solver instead of minimax")
+    parser.add_argument("-o", "--output", default=None)
+    parser.add_argument("--height", type=int, default=GameDim.HEIGHT.value)
+    parser.add_argument("--length", type=int, default=GameDim.LENGTH.value)
+    parser.add_argument("--connect", type=int, default=GameDim.CONNECT.value)
+    cli = parser.parse_args()
+    generate_book(cli.plies, solver_evaluator() if cli.solver else minimax_evaluator(cli.depth), cli.output, cli.height, cli.length, cli.connect,
+                  verbose=True)
@@ -0,0 +1,111 @@
+import numpy as np
+from functools import lru_cache
+from typing import Optional, Tuple
+from agents.common import BoardPiece, PlayerAction, GameDim, NO_PLAYER
+
+
+# Zobrist hashing: every (player, row, column) gets a random 64 bit number, the key of a board
+# is the XOR of the numbers of its pieces. Putting a piece changes the key by a single XOR.
+ZOBRIST_SEED = 4
+
+
+@lru_cache(maxsize=None)
+def zobrist_numbers(height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value) -> np.ndarray:
+    """
+    Random numbers, shape (3, height, length), indexed by [player, row, column]. The row of NO_PLAYER is zero.
+    The seed is fixed, so the keys are the same in every process (and run).
+    """
+    rng = np.random.default_rng(ZOBRIST_SEED)
+    numbers = rng.integers(0, 2 ** 64, size=(3, height, length), dtype=np.uint64, endpoint=False)
+    numbers[NO_PLAYER] = 0
+    numbers.flags.writeable = False
+    return numbers
+
+
+def zobrist_hash(board: np.ndarray) -> int:
+    """
+    The key of the whole board.
+    """
+    numbers = zobrist_numbers(*board.shape)
+    rows, columns = np.nonzero(board)
+    return int(np.bitwise_xor.reduce(numbers[board[rows, columns], rows, columns], initial=np.uint64(0)))
+
+
+def zobrist_update(key: int, row: int, action: PlayerAction, player: BoardPiece,
+                   height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value) -> int:
+    """
+    The key after the player puts (or removes) a piece at (row, action).
+    """
+    return key ^ int(zobrist_numbers(height, length)[player, row, action])
+
+
+# Kinds of the stored values of an alpha-beta search.
+EXACT = 0
+LOWER_BOUND = 1  # the search failed high, value >= stored value
+UPPER_BOUND = 2  # the search failed low, value <= stored value
+
+NO_MOVE = -1
+
+TTEntry = Tuple[int, int, int, int]  # depth, value, flag, best move
+
+
+class TranspositionTable:
+    """
+    Fixed size table of search results, indexed by the lowest bits of the Zobrist key.
+    Every bucket has two entries:
+        - [0] depth-preferred: replaced only by a search at least as deep (or of the same position),
+        - [1] always-replace: takes everything else (and the evicted depth-preferred entry).
+    Entries store the full key, so a probe of a different position in the same bucket is a miss.
+    """
+
+    def __init__(self, size_log2: int = 20):
+        size = 1 << size_log2
+        self.index_mask = size - 1
+        self.keys = np.zeros((size, 2), dtype=np.uint64)
+        self.depths = np.full((size, 2), -1, dtype=np.int16)  # -1 for an empty entry
+        self.values = np.zeros((size, 2), dtype=np.int32)
+        self.flags = np.zeros((size, 2), dtype=np.int8)
+        self.moves = np.full((size, 2), NO_MOVE, dtype=np.int8)
+        self.hits = 0
+        self.misses = 0
+
+    def _write(self, bucket: int, slot: int, key: int, depth: int, value: int, flag: int, move: int):
+        self.keys[bucket, slot] = key
+        self.depths[bucket, slot] = depth
+        self.values[bucket, slot] = value
+        self.flags[bucket, slot] = flag
+        self.moves[bucket, slot] = move
+
+    def store(self, key: int, depth: int, value: int, flag: int, move: int = NO_MOVE):
+        """
+        :param depth: the remaining depth of the search, which found the value.
+        :param flag: EXACT, LOWER_BOUND or UPPER_BOUND.
+        :param move: the best move found (NO_MOVE, if none).
+        """
+        bucket = key & self.index_mask
+        if depth >= self.depths[bucket, 0] or int(self.keys[bucket, 0]) == key:
+            if int(self.keys[bucket, 0]) != key and self.depths[bucket, 0] >= 0:
+                # The deep entry of another position is not lost at once, it goes to the always-replace slot.
+                self._write(bucket, 1, int(self.keys[bucket, 0]), int(self.depths[bucket, 0]),
+                            int(self.values[bucket, 0]), int(self.flags[bucket, 0]), int(self.moves[bucket, 0]))
+            self._write(bucket, 0, key, depth, value, flag, move)
+        else:
+            self._write(bucket, 1, key, depth, value, flag, move)
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """
+        :return: (depth, value, flag, move) of the position or None.
+        """
+        bucket = key & self.index_mask
+        for slot in (0, 1):
+            if int(self.keys[bucket, slot]) == key and self.depths[bucket, slot] >= 0:
+                self.hits += 1
+                return (int(self.depths[bucket, slot]), int(self.values[bucket, slot]),
+                        int(self.flags[bucket, slot]), int(self.moves[bucket, slot]))
+        self.misses += 1
+        return None
+
+    def clear(self):
+        self.depths[:] = -1
+        self.hits = 0
+        self.misses = 0
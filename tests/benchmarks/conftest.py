@@ -0,0 +1,53 @@
+"""
+Benchmarks of agents.common and the MCTS hot paths, on a fixed corpus of boards (pytest-benchmark).
+They are skipped in the normal test run, to run them and save a baseline:
+    python -m pytest tests/benchmarks --benchmark-only --benchmark-save=baseline
+To compare with the last saved run, failing on a regression of the median by more than 25%:
+    python -m pytest tests/benchmarks --benchmark-only --benchmark-compare --benchmark-compare-fail=median:25%
+Without pytest-benchmark installed, the directory is ignored.
+"""
+import numpy as np
+import pytest
+
+from agents.common import BoardPiece, PLAYER1, initialize_game_state, apply_player_action, opponent
+
+try:
+    import pytest_benchmark
+except ImportError:
+    collect_ignore_glob = ["test_*.py"]
+
+
+# Move sequences (columns, player 1 first) without a win, leading to the boards of the corpus.
+CORPUS = {
+    "opening": [3, 3, 2, 4],
+    "midgame": [5, 4, 3, 1, 2, 0, 0, 0, 1, 5, 4, 6, 3, 4, 6, 5],
+    "endgame": [4, 5, 1, 6, 5, 5, 5, 0, 1, 0, 5, 2, 2, 6, 1, 6, 2, 3, 5, 4, 2, 1, 6, 4, 4, 4, 0, 0, 1, 6, 4, 1,
+                3, 0],
+}
+
+
+def corpus_board(phase: str):
+    """
+    :return: the board of the phase, the player to move and the last action.
+    """
+    board = initialize_game_state()
+    player = PLAYER1
+    for action in CORPUS[phase]:
+        apply_player_action(board, action, player)
+        player = opponent(player)
+    return board, BoardPiece(player), CORPUS[phase][-1]
+
+
+@pytest.fixture(params=list(CORPUS))
+def position(request):
+    np.random.seed(0)
+    return corpus_board(request.param)
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("benchmark_only", default=False):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmark-only")
+    for item in items:
+        if "benchmarks" in item.nodeid.split("/"):
+            item.add_marker(skip)
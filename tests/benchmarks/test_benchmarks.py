@@ -0,0 +1,59 @@
+import numpy as np
+
+from agents.common import apply_player_action, lowest_free, connect, check_end_state, available_moves, opponent
+from agents.agent_mcts.mcts import MCTS, Node, generate_move_mcts
+
+
+def test_bench_apply_player_action(benchmark, position):
+    board, player, last_action = position
+    action = available_moves(board)[0]
+    benchmark(apply_player_action, board, action, player, True)
+
+
+def test_bench_lowest_free(benchmark, position):
+    board, player, last_action = position
+    benchmark(lowest_free, board, 3)
+
+
+def test_bench_connect(benchmark, position):
+    board, player, last_action = position
+    benchmark(connect, board, opponent(player))
+
+
+def test_bench_check_end_state(benchmark, position):
+    board, player, last_action = position
+    benchmark(check_end_state, board, opponent(player))
+
+
+def test_bench_check_end_state_last_action(benchmark, position):
+    board, player, last_action = position
+    benchmark(check_end_state, board, opponent(player), last_action)
+
+
+def test_bench_available_moves(benchmark, position):
+    board, player, last_action = position
+    benchmark(available_moves, board)
+
+
+def test_bench_mcts_playout(benchmark, position):
+    board, player, last_action = position
+    node = Node(board, player, action=last_action)
+    benchmark(MCTS.playout, node)
+
+
+def test_bench_mcts_select(benchmark, position):
+    board, player, last_action = position
+    tree = MCTS(Node(board, player, action=last_action))
+    tree.search(nr_of_loops=500)
+    benchmark(tree.select)
+
+
+def test_bench_generate_move_mcts(benchmark, position):
+    board, player, last_action = position
+
+    def generate_move():
+        np.random.seed(0)
+        return generate_move_mcts(board, player, None, nr_of_loops=200)
+
+    action, saved_state = benchmark.pedantic(generate_move, rounds=5, iterations=1)
+    assert action in available_moves(board)
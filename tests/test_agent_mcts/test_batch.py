@@ -0,0 +1,65 @@
+import numpy as np
+
+from agents.common import initialize_game_state, BoardPiece
+from agents.agent_mcts.batch import batch_playout, _lines_won
+from agents.agent_mcts.mcts import MCTS, Node
+from tests.test_common import prepare_board_and_player_for_testing, prepare_board_for_testing
+
+
+def test_lines_won():
+    boards = np.zeros((4, 12, 13), dtype=BoardPiece)
+    # padded by 3: a horizontal, vertical, diagonal line and no line
+    boards[0, 3, 3:7] = 1
+    boards[1, 3:7, 5] = 2
+    boards[2, [3, 4, 5, 6], [3, 4, 5, 6]] = 1
+    boards[3, 3, [3, 4, 6]] = 1
+    won = _lines_won(boards, np.arange(4), np.array([3, 6, 5, 3]), np.array([6, 5, 5, 6]),
+                     np.array([1, 2, 1, 1], dtype=BoardPiece), 4)
+    assert list(won) == [True, True, True, False]
+
+
+def test_batch_playout_counts():
+    for i in range(20):
+        board, player = prepare_board_and_player_for_testing()
+        results = batch_playout(board, player, 64)
+        assert results.shape == (3,)
+        assert results.sum() == 64
+        assert results.min() >= 0
+
+
+def test_batch_playout_end_states():
+    board, low_frees = prepare_board_for_testing(full=True)
+    board[:, :] = np.tile([[1, 1, 2, 2, 1, 1, 2], [2, 2, 1, 1, 2, 2, 1]], (3, 1))
+    assert list(batch_playout(board, BoardPiece(1), 10)) == [10, 0, 0]
+    board = initialize_game_state()
+    board[0, 0:4] = BoardPiece(2)
+    assert list(batch_playout(board, BoardPiece(1), 10)) == [0, 0, 10]
+
+
+def test_batch_playout_statistics():
+    # On the empty board the first player wins more random games (more than 50%).
+    results = batch_playout(initialize_game_state(), BoardPiece(1), 2000)
+    assert results[1] > results[2]
+    # With three pieces in a column and the move, player 2 wins most random games.
+    board = initialize_game_state()
+    board[0:3, 3] = BoardPiece(2)
+    board[0, 0:2] = BoardPiece(1)
+    board[0, 6] = BoardPiece(1)
+    results = batch_playout(board, BoardPiece(2), 500)
+    assert results[2] > 3 * results[1]
+
+
+def test_MCTS_batch_backprop():
+    root = Node(*prepare_board_and_player_for_testing())
+    t = MCTS(root, playouts_per_leaf=32)
+    loops = t.search(nr_of_loops=20)
+    assert loops == 20
+    assert root.trials == 20 * 32
+    for child in root.children.values():
+        assert child.wins <= child.trials
+
+    child = MCTS.expand(root) if root.unexpanded else list(root.children.values())[0]
+    trials, wins = child.trials, child.wins
+    MCTS.backprop_batch(child, np.array([1, 2, 3]))
+    assert child.trials == trials + 6
+    assert child.wins == wins + (2 if child.player == 2 else 3)
@@ -0,0 +1,98 @@
+import numpy as np
+
+from agents.common import initialize_game_state, BoardPiece, PlayerAction, available_moves, apply_player_action
+from agents.bitboard import bitboard_to_board, bitboard_from_pieces, board_to_bitboard
+from agents.agent_mcts.flat import FlatTree, NO_NODE, IS_WIN, generate_move_mcts_flat
+from agents.agent_mcts.mcts import MCTS, Node, SavedStateMCTS
+from tests.test_common import prepare_board_and_player_for_testing, prepare_board_for_testing
+
+
+def test_bitboard_from_pieces():
+    for i in range(20):
+        board, low_frees = prepare_board_for_testing()
+        bitboard = board_to_bitboard(board)
+        rebuilt = bitboard_from_pieces(*bitboard.pieces)
+        assert rebuilt.heights == bitboard.heights
+        assert rebuilt.moves == bitboard.moves
+
+
+def test_flat_tree_expand_and_backprop():
+    board = initialize_game_state()
+    t = FlatTree(board, BoardPiece(1))
+    child = t.expand(t.root)
+    action = int(np.argmax(t.children[t.root] != NO_NODE))
+    assert t.parent[child] == t.root
+    assert t.player[child] == BoardPiece(2)
+    assert (bitboard_to_board(t.bitboard(child)) == apply_player_action(board, action, BoardPiece(1), True)).all()
+    assert t.unexpanded[t.root] == (1 << 7) - 1 - (1 << action)
+
+    t.backprop(child, BoardPiece(1))
+    assert t.trials[child] == 1 and t.wins[child] == 1
+    assert t.trials[t.root] == 1 and t.wins[t.root] == 0
+    t.backprop(child, BoardPiece(0))
+    assert t.trials[child] == 2 and t.wins[child] == 1
+
+
+def test_flat_tree_grows_by_chunks():
+    t = FlatTree(*prepare_board_and_player_for_testing(), chunk=16)
+    t.search(nr_of_loops=100)
+    assert t.capacity % 16 == 0
+    assert t.size <= t.capacity
+    assert t.trials[t.root] == 100
+    kids = t.children[t.root]
+    assert t.trials[kids[kids != NO_NODE]].sum() <= 100
+
+
+def test_flat_tree_reroot():
+    t = FlatTree(initialize_game_state(), BoardPiece(1))
+    t.search(nr_of_loops=300)
+    action = t.best_action()
+    child = t.children[t.root, action]
+    trials, size = t.trials[child], t.size
+    t.reroot(child)
+    assert t.root == 0
+    assert t.parent[0] == NO_NODE
+    assert t.trials[0] == trials
+    assert t.size < size
+    for node in range(1, t.size):
+        assert 0 <= t.parent[node] < t.size
+        assert node in t.children[t.parent[node]]
+
+
+def test_flat_tree_takes_less_memory():
+    board, player = initialize_game_state(), BoardPiece(1)
+    t = FlatTree(board, player)
+    t.search(nr_of_loops=200)
+    assert t.nbytes() / t.size < 100
+    assert t.state[t.root] != IS_WIN
+
+
+def test_generate_move_mcts_flat():
+    board = initialize_game_state()
+    board[0, 2:5] = BoardPiece(1)
+    board[0, 0:2] = BoardPiece(2)
+    action, saved_state = generate_move_mcts_flat(board, BoardPiece(2), None, nr_of_loops=3000)
+    assert isinstance(action, PlayerAction)
+    assert action == 5
+
+    # The tree is reused after the opponent's move.
+    apply_player_action(board, action, BoardPiece(2))
+    tree = saved_state.tree
+    move = PlayerAction(available_moves(board)[0])
+    apply_player_action(board, move, BoardPiece(1))
+    action, saved_state = generate_move_mcts_flat(board, BoardPiece(2), saved_state, nr_of_loops=100)
+    assert saved_state.tree is tree
+    assert action in available_moves(board)
+
+
+def test_generate_move_mcts_flat_other_dimensions():
+    board = initialize_game_state(7, 8)
+    board[0, 3:7] = BoardPiece(1)
+    action, saved_state = generate_move_mcts_flat(board, BoardPiece(2), None, nr_of_loops=100, n=5)
+    assert saved_state.tree.length == 8 and saved_state.tree.n == 5
+
+    # 10 * 10 bits don't fit in np.uint64, the object tree takes over.
+    board = initialize_game_state(9, 10)
+    action, saved_state = generate_move_mcts_flat(board, BoardPiece(1), None, nr_of_loops=100, n=5)
+    assert action in range(10)
+    assert isinstance(saved_state, SavedStateMCTS)
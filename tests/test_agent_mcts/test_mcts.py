@@ -271,3 +271,162 @@ def test_generate_move_mcts_vs_random():
     """
 
     """
+
+
+def test_MCTS_search_budgets():
+    import time
+    root = Node(*prepare_board_and_player_for_testing())
+    t = MCTS(root)
+    assert t.search(nr_of_loops=50) == 50
+    assert root.trials == 50
+
+    t0 = time.perf_counter()
+    loops = t.search(time_limit_ms=100)
+    assert loops >= 1
+    assert time.perf_counter() - t0 < 1
+
+    assert t.search(nr_of_loops=5, time_limit_ms=10000) == 5
+    with pytest.raises(ValueError):
+        t.search()
+
+
+def test_generate_move_mcts_time_limit():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), None, time_limit_ms=50)
+    assert action in range(7)
+    assert saved_state.iterations >= 1
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), None, nr_of_loops=30)
+    assert saved_state.iterations == 30
+
+
+def test_MCTS_transpositions_share_statistics():
+    from agents.agent_mcts.mcts import TranspositionNode
+    from agents.transposition import zobrist_hash
+
+    root = TranspositionNode(initialize_game_state(), BoardPiece(1))
+    t = MCTS(root)
+    t.search(nr_of_loops=600)
+    # After 0, 1, 2 and 2, 1, 0 the same position is reached by player 1 to move.
+    paths = {}
+    for a, child in root.children.items():
+        for b, grandchild in child.children.items():
+            for c, node in grandchild.children.items():
+                paths.setdefault(node.key, []).append(node)
+    shared = [nodes for nodes in paths.values() if len(nodes) > 1]
+    assert shared
+    for nodes in shared:
+        assert all(node.stats is nodes[0].stats for node in nodes)
+        assert nodes[0].key == zobrist_hash(nodes[0].board)
+    assert root.trials == 600
+
+    nodes, count = [root], 0
+    while nodes:
+        node = nodes.pop()
+        count += 1
+        nodes.extend(node.children.values())
+    assert len(root.table) < count
+
+
+def test_generate_move_mcts_transpositions():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), None, nr_of_loops=200, transpositions=True)
+    assert action in range(7)
+    assert saved_state.tree.root.table is not None
+
+
+def test_MCTS_advance_unseen_move():
+    board = initialize_game_state()
+    root = Node(board, BoardPiece(1))
+    t = MCTS(root)
+    t.search(nr_of_loops=3)
+    unseen = [a for a in range(7) if a not in root.children][0]
+    new_board = apply_player_action(board, unseen, BoardPiece(1), copy=True)
+
+    assert t.advance(new_board, BoardPiece(2)) == 0
+    assert t.root.parent == "root"
+    assert (t.root.board == new_board).all()
+    assert t.root.player == BoardPiece(2)
+    assert unseen not in root.unexpanded
+
+    # Two moves at once, the second one never expanded.
+    t.search(nr_of_loops=50)
+    newer_board = apply_player_action(new_board, 3, BoardPiece(2), copy=True)
+    apply_player_action(newer_board, 3, BoardPiece(1))
+    assert t.advance(newer_board, BoardPiece(2)) is not None
+    assert (t.root.board == newer_board).all()
+
+
+def test_MCTS_advance_keeps_simulations():
+    board = initialize_game_state()
+    t = MCTS(Node(board, BoardPiece(1)))
+    t.search(nr_of_loops=300)
+    action, child = max(t.root.children.items(), key=lambda item: item[1].trials)
+    new_board = apply_player_action(board, action, BoardPiece(1), copy=True)
+    assert t.advance(new_board, BoardPiece(2)) == child.trials
+    assert t.root is child
+
+    # Boards not reachable from the root.
+    assert t.advance(board, BoardPiece(1)) is None
+    assert t.advance(new_board, BoardPiece(1)) is None
+    assert t.root is child
+
+
+def test_generate_move_mcts_reuse():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), None, nr_of_loops=300)
+    apply_player_action(board, action, BoardPiece(1))
+    for move in range(7):
+        if move not in saved_state.tree.root.children:
+            break
+    apply_player_action(board, move, BoardPiece(2))
+    tree = saved_state.tree
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), saved_state, nr_of_loops=100)
+    assert saved_state.tree is tree
+    assert saved_state.reused_trials >= 0
+    assert saved_state.tree.root.parent == "root"
+
+    # A board from another game starts a new tree.
+    action, saved_state = generate_move_mcts(initialize_game_state(), BoardPiece(1), saved_state, nr_of_loops=10)
+    assert saved_state.tree is not tree
+    assert saved_state.reused_trials == 0
+
+
+def test_generate_move_mcts_stats():
+    from agents.agent_mcts.mcts import SearchStats
+    calls = []
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), None, nr_of_loops=200,
+                                             callback=lambda tree, loop, leaf: calls.append(loop))
+    stats = saved_state.stats
+    assert isinstance(stats, SearchStats)
+    assert calls == list(range(1, 201))
+    assert stats.iterations == stats.playouts == 200
+    assert stats.playouts_per_second > 0
+    assert set(stats.phase_times) == {"select", "expand", "playout", "backprop"}
+    assert sum(stats.phase_times.values()) <= stats.elapsed
+    assert sum(stats.root_visits.values()) == 200
+    assert stats.tree_size == 201
+    assert stats.max_depth >= 2
+    assert stats.reused_nodes == 1
+
+    apply_player_action(board, action, BoardPiece(1))
+    apply_player_action(board, 0, BoardPiece(2))
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), saved_state, nr_of_loops=10)
+    assert saved_state.stats.reused_nodes >= 1
+    assert saved_state.stats.reused_trials == saved_state.reused_trials
+
+
+def test_generate_move_mcts_other_dimensions():
+    board = initialize_game_state(9, 10)
+    board[0, 0:4] = BoardPiece(1)
+    board[0:3, 9] = BoardPiece(2)
+    node = Node(board, BoardPiece(2), action=3)
+    leaf, game_state, player = MCTS.playout(node, n=4)
+    assert game_state == GameState.IS_WIN and leaf._count == 0
+    leaf, game_state, player = MCTS.playout(node, n=5)
+    assert leaf._count > 0
+
+    action, saved_state = generate_move_mcts(board, BoardPiece(2), None, nr_of_loops=300, n=5)
+    assert action in available_moves(board)
+    assert saved_state.tree.n == 5
+    assert saved_state.tree.root.board.shape == (9, 10)
@@ -0,0 +1,48 @@
+from agents.common import initialize_game_state, BoardPiece, PlayerAction, available_moves
+from agents.agent_mcts.parallel import generate_move_mcts_parallel, merge_root_statistics, best_action, \
+    root_statistics, get_pool, shutdown_pool, SavedStateParallelMCTS
+from tests.test_common import prepare_board_and_player_for_testing
+
+
+def test_merge_root_statistics():
+    merged = merge_root_statistics([{0: (1, 2), 3: (5, 10)}, {3: (2, 4), 6: (0, 1)}])
+    assert merged == {0: (1, 2), 3: (7, 14), 6: (0, 1)}
+    assert best_action(merged) == 3
+
+
+def test_root_statistics():
+    board, player = prepare_board_and_player_for_testing()
+    stats = root_statistics(board, player, 200, seed=1)
+    assert set(stats) <= set(available_moves(board))
+    assert all(wins <= trials for wins, trials in stats.values())
+
+
+def test_generate_move_mcts_parallel():
+    board, player = prepare_board_and_player_for_testing()
+    action, saved_state = generate_move_mcts_parallel(board, player, None, nr_of_workers=2, nr_of_loops=200)
+    assert isinstance(action, PlayerAction)
+    assert action in available_moves(board)
+    assert isinstance(saved_state, SavedStateParallelMCTS)
+    assert sum(trials for wins, trials in saved_state.statistics.values()) > 200
+
+    # The pool stays alive for the next move.
+    pool = get_pool(2)
+    generate_move_mcts_parallel(board, player, saved_state, nr_of_loops=50)
+    assert get_pool(2) is pool
+    shutdown_pool()
+
+
+def test_generate_move_mcts_parallel_win():
+    board = initialize_game_state()
+    board[0:3, 4] = BoardPiece(1)
+    board[0, 0:2] = BoardPiece(2)
+    action, saved_state = generate_move_mcts_parallel(board, BoardPiece(1), None, nr_of_workers=2, nr_of_loops=500)
+    assert action == 4
+    shutdown_pool()
+
+
+def test_generate_move_mcts_parallel_time_limit():
+    board, player = prepare_board_and_player_for_testing()
+    action, saved_state = generate_move_mcts_parallel(board, player, None, nr_of_workers=2, time_limit_ms=100)
+    assert action in available_moves(board)
+    shutdown_pool()
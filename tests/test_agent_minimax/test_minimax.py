@@ -1,14 +1,78 @@
 import numpy as np
 
-from agents.common import BoardPiece, SavedState
-from agents.agent_minimax.minimax import generate_move_minimax
+from agents.common import BoardPiece, SavedState, PlayerAction, initialize_game_state, available_moves
+from agents.agent_minimax.minimax import generate_move_minimax, SavedStateMinimax, center_first, WIN_THRESHOLD
 
 
 def test_generate_move_minimax():
     from ..test_common import prepare_board_for_testing
     board, low_frees = prepare_board_for_testing()
     player = 1 + np.int8(np.random.randint(2)).astype(BoardPiece)
-   # state = SavedState(2, 0, [0, None], [0, None])  # depth, count_depth,
-                                        # heuristic for action, max heuristic for action
-    a = generate_move_minimax(board, player, None)
-    # Remark: there's no test here
\ No newline at end of file
+    a = generate_move_minimax(board, player, None, max_depth=4)
+    action, saved_state = a
+    assert isinstance(action, PlayerAction)
+    assert action in available_moves(board)
+    assert isinstance(saved_state, SavedStateMinimax)
+    assert isinstance(saved_state, SavedState)
+
+
+def test_center_first():
+    assert center_first(7) == [3, 2, 4, 1, 5, 0, 6]
+
+
+def test_generate_move_minimax_immediate_win_and_block():
+    board = initialize_game_state()
+    board[0:3, 4] = BoardPiece(1)
+    board[0, 0:2] = BoardPiece(2)
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), None)
+    assert action == 4
+    assert saved_state.value > WIN_THRESHOLD
+
+    board = initialize_game_state()
+    board[0, 2:5] = BoardPiece(1)
+    board[0, 0:2] = BoardPiece(2)
+    action, saved_state = generate_move_minimax(board, BoardPiece(2), None)
+    assert action == 5
+
+
+def test_generate_move_minimax_forced_win():
+    # Two open ends of a row of two: player 1 wins in three plies.
+    board = initialize_game_state()
+    board[0, 2:4] = BoardPiece(1)
+    board[0:2, 6] = BoardPiece(2)
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), None, max_depth=5)
+    assert action in (1, 4)
+    assert saved_state.value > WIN_THRESHOLD
+
+
+def test_generate_move_minimax_deterministic_and_limits():
+    board = initialize_game_state()
+    action_1, state_1 = generate_move_minimax(board, BoardPiece(1), None, max_depth=5)
+    action_2, state_2 = generate_move_minimax(board, BoardPiece(1), None, max_depth=5)
+    assert action_1 == action_2 == 3
+    assert state_1.depth == 5
+    assert state_1.nodes == state_2.nodes
+
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), None, max_depth=42, time_limit_ms=100)
+    assert action in range(7)
+    assert saved_state.depth < 42
+
+
+def test_generate_move_minimax_uses_table():
+    board = initialize_game_state()
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), None, max_depth=6)
+    nodes = saved_state.nodes
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), saved_state, max_depth=6)
+    assert saved_state.nodes < nodes
+    assert saved_state.table.hits > 0
+
+
+def test_generate_move_minimax_other_dimensions():
+    board = initialize_game_state(9, 10)
+    board[0, 3:7] = BoardPiece(1)
+    action, saved_state = generate_move_minimax(board, BoardPiece(1), None, max_depth=3, n=5)
+    assert action in (2, 7)
+    assert saved_state.value > WIN_THRESHOLD
+    action, saved_state = generate_move_minimax(board, BoardPiece(2), None, max_depth=4, n=6)
+    assert action in range(10)
+    assert abs(saved_state.value) < WIN_THRESHOLD
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+
+import agents.agent_solver.solver as solver_module
+from agents.common import BoardPiece, PlayerAction, GameDim, initialize_game_state, apply_player_action, opponent
+from agents.bitboard import BitBoard, board_to_bitboard
+from agents.opening_book import OpeningBook, generate_book, solver_evaluator
+from agents.agent_solver.solver import Solver, SolvedCache, SavedStateSolver, generate_move_solver, solve_move, \
+    default_cache_path
+from agents.agent_mcts.mcts import generate_move_mcts
+
+
+def brute_force(bitboard: BitBoard, player: BoardPiece, n: int) -> int:
+    """
+    Plain negamax over the whole game tree, in the scores of the solver.
+    """
+    cells = bitboard.height * bitboard.length
+    best = None
+    for action in bitboard.legal_moves():
+        child = bitboard.copy()
+        child.play(action, player)
+        if child.is_win(player, n):
+            score = (cells + 1 - bitboard.moves) // 2
+        elif child.is_full():
+            score = 0
+        else:
+            score = -brute_force(child, opponent(player), n)
+        best = score if best is None else max(best, score)
+    return best
+
+
+def random_position(height, length, n, plies, rng):
+    while True:
+        bitboard, player = BitBoard(height, length), BoardPiece(1)
+        for ply in range(plies):
+            bitboard.play(rng.choice(bitboard.legal_moves()), player)
+            if bitboard.is_win(player, n):
+                break
+            player = opponent(player)
+        else:
+            if not bitboard.is_full():
+                return bitboard, player
+
+
+def test_solver_agrees_with_brute_force():
+    rng = np.random.default_rng(16)
+    for height, length, n, plies in ((4, 4, 3, 6), (4, 5, 4, 10), (5, 4, 3, 9), (6, 7, 4, 33)):
+        solver = Solver(height, length, n, table_size_log2=14)
+        for i in range(15):
+            bitboard, player = random_position(height, length, n, plies + i % 3, rng)
+            score = brute_force(bitboard, player, n)
+            assert solver.solve(bitboard, player) == score
+            move, best_score = solver.best_move(bitboard, player)
+            assert best_score == score
+            child = bitboard.copy()
+            child.play(move, player)
+            assert child.is_win(player, n) or child.is_full() or -solver.solve(child, opponent(player)) == score
+
+
+def test_generate_move_solver():
+    board = initialize_game_state()
+    board[0, 2:5] = BoardPiece(1)
+    board[0:2, 0] = BoardPiece(2)
+    action, saved_state = generate_move_solver(board, BoardPiece(1), None, cache=False)
+    assert action in (1, 5)
+    assert saved_state.score == (42 + 1 - 5) // 2
+    assert isinstance(saved_state, SavedStateSolver)
+
+    board = initialize_game_state()
+    board[0, 0:3] = BoardPiece(1)
+    board[0:2, 6] = BoardPiece(2)
+    action, saved_state = generate_move_solver(board, BoardPiece(2), saved_state, time_limit_ms=2000, cache=False)
+    assert action == 3
+
+    # The empty board is not solved in time, minimax plays.
+    action, saved_state = generate_move_solver(initialize_game_state(), BoardPiece(1), None,
+                                               time_limit_ms=50, cache=False)
+    assert saved_state.score is None
+    assert action in range(GameDim.LENGTH.value)
+
+
+def test_solved_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(solver_module, "CACHE_DIRECTORY", str(tmp_path))
+    rng = np.random.default_rng(3)
+    bitboard, player = random_position(6, 7, 4, 30, rng)
+    from agents.bitboard import bitboard_to_board
+    board = bitboard_to_board(bitboard)
+    action, saved_state = generate_move_solver(board, player, None)
+    assert os.path.exists(default_cache_path())
+    assert len(saved_state.solver.cache) == 1
+
+    # A new run finds the position in the cache, without searching.
+    cache = SolvedCache(default_cache_path())
+    assert cache.get(bitboard) == (action, saved_state.score)
+    assert cache.get(board_to_bitboard(np.fliplr(board))) == (6 - action, saved_state.score)
+    again, saved_state = generate_move_solver(board, player, None)
+    assert again == action and saved_state.nodes == 0
+
+    # The cache is a book as well.
+    book = OpeningBook(default_cache_path())
+    assert book.lookup(bitboard) == (action, saved_state.score)
+
+
+def test_solve_move_and_mcts_endgame():
+    rng = np.random.default_rng(5)
+    bitboard, player = random_position(6, 7, 4, 30, rng)
+    from agents.bitboard import bitboard_to_board
+    board = bitboard_to_board(bitboard)
+    move, score = solve_move(board, player)
+    action, saved_state = generate_move_mcts(board, player, None)
+    assert action == move
+    assert saved_state.iterations == 0
+    assert (saved_state.tree.root.board == apply_player_action(board, action, player, copy=True)).all()
+    action, saved_state = generate_move_mcts(board, player, None, nr_of_loops=20, solver_cells=0)
+    assert saved_state.iterations == 20
+    assert solve_move(initialize_game_state(), BoardPiece(1), time_limit_ms=20) is None
+
+
+def test_book_by_solver(tmp_path):
+    path = str(tmp_path / "book.npy")
+    entries = generate_book(2, solver_evaluator(), path, 4, 4, 3)
+    book = OpeningBook(path, 4)
+    solver = Solver(4, 4, 3)
+    assert len(book) == len(entries)
+    for key, move, score in entries.tolist():
+        assert isinstance(move, int)
+    empty = BitBoard(4, 4)
+    assert book.lookup(empty)[1] == solver.solve(empty, BoardPiece(1)) == brute_force(empty, BoardPiece(1), 3)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from agents.common import BoardPiece, GameState, initialize_game_state, apply_player_action, available_moves, \
+    check_end_state, connect, opponent
+from agents.bitboard import BitBoard, board_to_bitboard, bitboard_to_board, connected, fits_in_64_bits
+from tests.test_common import prepare_board_for_testing
+
+
+def test_board_to_bitboard_and_back():
+    for i in range(50):
+        board, low_frees = prepare_board_for_testing()
+        bitboard = board_to_bitboard(board)
+        assert bitboard.moves == np.count_nonzero(board)
+        assert (bitboard_to_board(bitboard) == board).all()
+        assert bitboard_to_board(bitboard).dtype == BoardPiece
+
+
+def test_bitboard_play_matches_apply_player_action():
+    board = initialize_game_state()
+    bitboard = BitBoard()
+    player = BoardPiece(1)
+    for action in [3, 3, 2, 4, 3, 0, 6, 6, 6, 6, 6, 6]:
+        assert bitboard.can_play(action)
+        apply_player_action(board, action, player)
+        bitboard.play(action, player)
+        player = opponent(player)
+    assert not bitboard.can_play(6)
+    assert bitboard.legal_moves() == list(available_moves(board))
+    assert (bitboard_to_board(bitboard) == board).all()
+
+
+def test_legal_moves_mask():
+    bitboard = BitBoard()
+    assert bitboard.legal_moves_mask() == sum(1 << (7 * j) for j in range(7))
+    for i in range(6):
+        bitboard.play(0, BoardPiece(1 + i % 2))
+    assert bitboard.legal_moves_mask() & ((1 << 7) - 1) == 0
+    assert bitboard.legal_moves() == [1, 2, 3, 4, 5, 6]
+
+
+def test_connected_lines():
+    for kernel in [np.ones((1, 4)), np.ones((4, 1)), np.eye(4), np.fliplr(np.eye(4))]:
+        board = initialize_game_state()
+        board[1:1 + kernel.shape[0], 2:2 + kernel.shape[1]] = kernel
+        bitboard = board_to_bitboard(board)
+        assert bitboard.is_win(BoardPiece(1))
+        assert not bitboard.is_win(BoardPiece(2))
+    # Pieces at the top of one column and at the bottom of the next one are not in line.
+    board = initialize_game_state()
+    board[4:6, 0] = BoardPiece(1)
+    board[0:2, 1] = BoardPiece(1)
+    assert not connected(board_to_bitboard(board).pieces[0])
+
+
+def test_end_state_agrees_with_check_end_state():
+    for i in range(200):
+        board, low_frees = prepare_board_for_testing(full=i % 2 == 0)
+        bitboard = board_to_bitboard(board)
+        for player in (BoardPiece(1), BoardPiece(2)):
+            assert bitboard.is_win(player) == connect(board, player)
+            assert bitboard.end_state(player) == check_end_state(board, player)
+
+
+def test_key_is_unique():
+    keys = {}
+    for i in range(300):
+        board, low_frees = prepare_board_for_testing()
+        key = board_to_bitboard(board).key()
+        if key in keys:
+            assert (keys[key] == board).all()
+        keys[key] = board
+    assert BitBoard().key() != board_to_bitboard(apply_player_action(initialize_game_state(), 0, 1)).key()
+
+
+def test_end_state_draw():
+    board, low_frees = prepare_board_for_testing(full=True)
+    bitboard = board_to_bitboard(board)
+    for player in (BoardPiece(1), BoardPiece(2)):
+        if not bitboard.is_win(player):
+            assert bitboard.end_state(player) == GameState.IS_DRAW
+
+
+def test_other_dimensions():
+    assert fits_in_64_bits(6, 7) and fits_in_64_bits(7, 8)
+    assert not fits_in_64_bits(9, 10)
+    rng = np.random.default_rng(14)
+    for height, length, n in ((7, 8, 4), (9, 10, 5)):
+        for i in range(20):
+            board = initialize_game_state(height, length)
+            bitboard = board_to_bitboard(board)
+            player = BoardPiece(1)
+            while bitboard.legal_moves():
+                action = rng.choice(bitboard.legal_moves())
+                apply_player_action(board, action, player)
+                bitboard.play(action, player)
+                assert bitboard.end_state(player, n) == check_end_state(board, player, action, n)
+                if bitboard.is_win(player, n):
+                    break
+                player = opponent(player)
+            assert (bitboard_to_board(bitboard) == board).all()
@@ -1,7 +1,7 @@
 import numpy as np
 from enum import Enum
 from agents.common import BoardPiece, NO_PLAYER, PlayerAction, GameState
-from agents.common import initialize_game_state, apply_player_action, opponent
+from agents.common import initialize_game_state, apply_player_action, opponent, lowest_free
 
 rng = np.random.default_rng()
 
@@ -66,6 +66,35 @@ def test_string_to_board():
     assert (rerety == example_game_state).all()
 
 
+def test_pretty_print_and_string_to_board_other_dimensions():
+    from agents.common import pretty_print_board, string_to_board
+
+    for height, length in ((7, 8), (9, 10), (4, 12)):
+        board = initialize_game_state(height, length)
+        assert board.shape == (height, length)
+        board[0, :3] = BoardPiece(1)
+        board[1, length - 1] = BoardPiece(2)
+        p_print_b = pretty_print_board(board)
+        assert len(p_print_b.splitlines()) == height + 3
+        assert p_print_b.splitlines()[-1] == '|' + ''.join(f'{j % 10} ' for j in range(length)) + '|'
+        assert (string_to_board(p_print_b) == board).all()
+
+
+def test_check_end_state_connect_n():
+    from agents.common import check_end_state
+
+    board = initialize_game_state(9, 10)
+    board[0, 2:6] = BoardPiece(1)
+    assert check_end_state(board, BoardPiece(1), n=4) == GameState.IS_WIN
+    assert check_end_state(board, BoardPiece(1), 5, n=5) == GameState.STILL_PLAYING
+    apply_player_action(board, 6, BoardPiece(1))
+    assert check_end_state(board, BoardPiece(1), n=5) == GameState.IS_WIN
+    assert check_end_state(board, BoardPiece(1), 6, n=5) == GameState.IS_WIN
+    board[1:6, 9] = BoardPiece(2)
+    assert check_end_state(board, BoardPiece(2), 9, n=5) == GameState.IS_WIN
+    assert check_end_state(board, BoardPiece(2), 9, n=6) == GameState.STILL_PLAYING
+
+
 # maydo: Tail recursive search in the string.
 # Remark: you're not testing if the function works specifically. You should test at least one specific example. You're
 #         basically only testing, whether pretty_print_board and string_to_board are inverses of each other.
@@ -85,7 +114,7 @@ def prepare_board_and_player_for_testing():
         player = BoardPiece(np.random.randint(1, 3))
 
         for i in range(length):
-            move = generate_move_random(board, player, None)
+            move = generate_move_random(board, player, None)[0]
             board = apply_player_action(board, move, player)
             player = opponent(player)
         if not (connect(board, player) or connect(board, opponent(player
@@ -223,6 +252,84 @@ def test_check_end_state():
         #         PyCharm more or less does that for you due to the type hints.
 
 
+def test_check_end_state_last_action():
+    from agents.common import check_end_state, connect_last_action, connect
+    from agents.agent_random.random import generate_move_random
+
+    for i in range(200):
+        board = initialize_game_state()
+        player = BoardPiece(1)
+        game_state = GameState.STILL_PLAYING
+        while game_state == GameState.STILL_PLAYING:
+            action = generate_move_random(board, player, None)[0]
+            apply_player_action(board, action, player)
+            game_state = check_end_state(board, player, action)
+            assert game_state == check_end_state(board, player)
+            assert connect_last_action(board, player, action) == connect(board, player)
+            player = opponent(player)
+
+    board = initialize_game_state()
+    board[0, 0:3] = BoardPiece(1)
+    board[0:3, 6] = BoardPiece(2)
+    apply_player_action(board, 3, BoardPiece(1))
+    assert check_end_state(board, BoardPiece(1), 3) == GameState.IS_WIN
+    apply_player_action(board, 6, BoardPiece(2))
+    assert check_end_state(board, BoardPiece(2), 6) == GameState.IS_WIN
+
+
+def test_win_lines():
+    from agents.common import win_lines, cell_lines
+
+    lines = win_lines()
+    assert lines.shape == (69, 4, 2)
+    assert len({tuple(map(tuple, line)) for line in lines}) == 69
+    index = cell_lines()
+    assert sum(len(index[i][j]) for i in range(6) for j in range(7)) == 69 * 4
+    assert len(index[0][0]) == 3 and len(index[2][3]) == 13
+    for i in range(6):
+        for j in range(7):
+            for line in index[i][j]:
+                assert [i, j] in lines[line].tolist()
+    assert win_lines(5, 5, 5).shape == (12, 5, 2)
+
+
+def test_line_counts():
+    from agents.common import LineCounts, connect
+    from agents.agent_random.random import generate_move_random
+
+    weights = np.array([0, 1, 10, 50])
+    for i in range(50):
+        board = initialize_game_state()
+        line_counts = LineCounts(weights=weights)
+        player = BoardPiece(1)
+        won = False
+        while not won and (board == NO_PLAYER).any():
+            action = generate_move_random(board, player, None)[0]
+            row = lowest_free(board, action)
+            assert line_counts.wins_at(row, action, player) == \
+                connect(apply_player_action(board, action, player, copy=True), player)
+            apply_player_action(board, action, player, line_counts=line_counts)
+            won = line_counts.is_win(player)
+            assert won == connect(board, player)
+            from_board = LineCounts.from_board(board, weights=weights)
+            assert line_counts.counts == from_board.counts
+            assert line_counts.score(player) == from_board.score(player) == -from_board.score(opponent(player))
+            player = opponent(player)
+
+        line_counts.remove(row, action, opponent(player))
+        board[row, action] = NO_PLAYER
+        assert line_counts.counts == LineCounts.from_board(board).counts
+
+    board = initialize_game_state()
+    board[0, 1:4] = BoardPiece(1)
+    line_counts = LineCounts.from_board(board, weights=weights)
+    assert line_counts.open_lines(BoardPiece(1), 3) == 2
+    assert line_counts.open_lines(BoardPiece(2), 3) == 0
+    assert line_counts.score(BoardPiece(1)) > 0
+    assert not line_counts.add(1, 1, BoardPiece(2))
+    assert line_counts.add(0, 4, BoardPiece(1))
+
+
 def test_opponent():
     from agents.common import opponent
 
@@ -0,0 +1,104 @@
+import numpy as np
+
+import agents.opening_book as opening_book
+from agents.common import BoardPiece, PlayerAction, initialize_game_state, apply_player_action
+from agents.bitboard import board_to_bitboard, mirror_key
+from agents.opening_book import OpeningBook, book_positions, generate_book, book_move, canonical_key, \
+    minimax_evaluator, default_book_path, BOOK_DTYPE
+from agents.agent_mcts.mcts import generate_move_mcts
+from agents.agent_minimax.minimax import generate_move_minimax
+from tests.test_common import prepare_board_for_testing
+
+
+def leftmost_evaluator(board, player, n):
+    # Recognizable answers: the leftmost legal column, the score is the number of pieces.
+    return PlayerAction(np.argmax(board[-1] == 0)), int(np.count_nonzero(board))
+
+
+def use_book_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(opening_book, "BOOK_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(opening_book, "_books", {})
+
+
+def test_mirror_key():
+    for i in range(50):
+        board, low_frees = prepare_board_for_testing()
+        key = board_to_bitboard(board).key()
+        assert mirror_key(key) == board_to_bitboard(np.fliplr(board)).key()
+        assert mirror_key(mirror_key(key)) == key
+
+
+def test_book_positions():
+    assert [len(book_positions(plies)) for plies in range(4)] == [1, 5, 30, 151]
+    # Four pieces of one player in a row end the game, such positions are not in the book.
+    positions = book_positions(7, 4, 4, 3)
+    assert all(bitboard.moves <= 7 for bitboard, mirrored in positions.values())
+
+
+def test_generate_book_and_lookup(monkeypatch, tmp_path):
+    use_book_directory(monkeypatch, tmp_path)
+    entries = generate_book(3, leftmost_evaluator)
+    assert len(entries) == 151
+    assert (np.diff(entries["key"].astype(np.float64)) > 0).all()
+
+    book = OpeningBook(default_book_path())
+    assert len(book) == 151
+    assert isinstance(book.entries, np.memmap)
+    board = initialize_game_state()
+    assert book.lookup(board_to_bitboard(board)) == (0, 0)
+    for moves in ([5], [1], [6, 6], [0, 4, 2]):
+        board = initialize_game_state()
+        player = BoardPiece(1)
+        for move in moves:
+            apply_player_action(board, move, player)
+            player = BoardPiece(3 - player)
+        move, score = book.lookup(board_to_bitboard(board))
+        # The entry was evaluated on the board or on its mirror image.
+        mirror_move = 6 - leftmost_evaluator(np.fliplr(board), player, 4)[0]
+        assert move in (leftmost_evaluator(board, player, 4)[0], mirror_move)
+        assert score == len(moves)
+        key, mirrored = canonical_key(board_to_bitboard(board))
+        assert mirrored == (key != board_to_bitboard(board).key())
+
+    board = initialize_game_state()
+    board[0:2, 0] = BoardPiece(1)
+    board[0:2, 1] = BoardPiece(2)
+    assert book.lookup(board_to_bitboard(board)) is None
+    assert book_move(initialize_game_state(), 5) is None  # no book of connect-5
+    assert book_move(initialize_game_state(9, 10)) is None
+
+
+def test_agents_play_book_moves(monkeypatch, tmp_path):
+    use_book_directory(monkeypatch, tmp_path)
+    board = initialize_game_state()
+    apply_player_action(board, 6, BoardPiece(1))
+    action, saved_state = generate_move_minimax(board, BoardPiece(2), None)
+    assert saved_state.depth > 0
+
+    # A book of the single position, with the move 0.
+    key, mirrored = canonical_key(board_to_bitboard(board))
+    np.save(default_book_path(), np.array([(key, 6 if mirrored else 0, 1)], dtype=BOOK_DTYPE))
+    action, saved_state = generate_move_minimax(board, BoardPiece(2), None)
+    assert action == 0
+    assert saved_state.depth == 0 and saved_state.value == 1
+    action, saved_state = generate_move_mcts(board, BoardPiece(2), None)
+    assert action == 0
+    action, saved_state = generate_move_mcts(board, BoardPiece(2), None, nr_of_loops=10, book=False)
+    assert saved_state.iterations == 10
+
+    # Out of the book, the tree catches up with the board.
+    apply_player_action(board, action, BoardPiece(2))
+    apply_player_action(board, 3, BoardPiece(1))
+    apply_player_action(board, 3, BoardPiece(2))
+    tree = saved_state.tree
+    action, saved_state = generate_move_mcts(board, BoardPiece(1), saved_state, nr_of_loops=10)
+    assert saved_state.tree is tree
+
+
+def test_minimax_evaluator():
+    board = initialize_game_state()
+    board[0, 0:3] = BoardPiece(1)
+    board[0:2, 6] = BoardPiece(2)
+    move, score = minimax_evaluator(2)(board, BoardPiece(2), 4)
+    assert move == 3
+    assert abs(score) < 1000
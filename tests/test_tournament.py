@@ -0,0 +1,73 @@
+import json
+import pytest
+
+from agents.common import initialize_game_state, apply_player_action, check_end_state, GameState, BoardPiece
+from agents.agent_random.random import generate_move_random
+from agents.agent_minimax.minimax import generate_move_minimax
+from tournament import play_game, run_tournament, elo_difference, parse_agent
+
+
+def test_elo_difference():
+    assert elo_difference(5, 0, 5) == 0
+    assert elo_difference(3, 2, 1) > 0
+    assert elo_difference(1, 2, 3) == -elo_difference(3, 2, 1)
+    assert abs(elo_difference(3, 0, 1) - 190.8) < 0.1
+    assert elo_difference(10, 0, 0) < float("inf")
+
+
+def test_play_game():
+    game = play_game(generate_move_random, generate_move_random, seed=3)
+    assert game["winner"] in (0, 1, 2)
+    assert len(game["move_times"][0]) + len(game["move_times"][1]) == len(game["moves"])
+
+    # Replaying the moves gives the same result.
+    board = initialize_game_state()
+    player = BoardPiece(1)
+    for action in game["moves"]:
+        apply_player_action(board, action, player)
+        end_state = check_end_state(board, player, action)
+        player = BoardPiece(3 - player)
+    if game["winner"] == 0:
+        assert end_state == GameState.IS_DRAW
+    else:
+        assert end_state == GameState.IS_WIN
+        assert game["winner"] == 3 - player
+    assert play_game(generate_move_random, generate_move_random, seed=3)["moves"] == game["moves"]
+
+
+def test_play_game_illegal_move():
+    def always_zero(board, player, saved_state):
+        return 0, saved_state
+    game = play_game(always_zero, always_zero)
+    assert game["illegal"]
+    assert game["winner"] == 2  # player 2 puts the 6th piece in the column 0, player 1 can't play there any more.
+
+
+def test_run_tournament(tmp_path):
+    results_file = tmp_path / "results.json"
+    results = run_tournament("minimax", "random", 4, kwargs_1={"max_depth": 2},
+                             nr_of_workers=2, results_file=str(results_file))
+    assert results["wins"] + results["draws"] + results["losses"] == 4
+    assert results["wins"] >= 3
+    assert [game["agent_1_player"] for game in results["game_records"]] == [1, 2, 1, 2]
+    assert results["move_time"]["minimax"]["moves"] > 0
+    with open(results_file) as file:
+        assert json.load(file)["wins"] == results["wins"]
+
+
+def test_parse_agent():
+    assert parse_agent("mcts:time_limit_ms=100,playouts_per_leaf=8") == \
+        ("mcts", {"time_limit_ms": 100, "playouts_per_leaf": 8})
+    assert parse_agent("random") == ("random", {})
+    with pytest.raises(ValueError):
+        parse_agent("nobody")
+
+
+def test_play_game_other_dimensions():
+    game = play_game(generate_move_random, generate_move_random, seed=3, height=7, length=9, n=5)
+    assert all(0 <= move < 9 for move in game["moves"])
+    assert len(game["moves"]) <= 63
+    results = run_tournament("mcts", "minimax", 2, {"nr_of_loops": 50}, {"max_depth": 2},
+                             nr_of_workers=1, height=7, length=8)
+    assert results["board"] == {"height": 7, "length": 8, "connect": 4}
+    assert results["wins"] + results["draws"] + results["losses"] == 2
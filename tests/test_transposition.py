@@ -0,0 +1,66 @@
+import numpy as np
+
+from agents.common import BoardPiece, initialize_game_state, apply_player_action, lowest_free, opponent
+from agents.transposition import zobrist_hash, zobrist_update, TranspositionTable, EXACT, LOWER_BOUND, \
+    UPPER_BOUND
+from tests.test_common import prepare_board_for_testing
+
+
+def test_zobrist_hash_incremental():
+    board = initialize_game_state()
+    key = zobrist_hash(board)
+    assert key == 0
+    player = BoardPiece(1)
+    for action in [3, 3, 4, 0, 6, 3, 2]:
+        row = lowest_free(board, action)
+        apply_player_action(board, action, player)
+        key = zobrist_update(key, row, action, player)
+        assert key == zobrist_hash(board)
+        player = opponent(player)
+
+
+def test_zobrist_hash_transpositions():
+    board_1 = initialize_game_state()
+    board_2 = initialize_game_state()
+    for action, player in [(0, 1), (1, 2), (2, 1)]:
+        apply_player_action(board_1, action, BoardPiece(player))
+    for action, player in [(2, 1), (1, 2), (0, 1)]:
+        apply_player_action(board_2, action, BoardPiece(player))
+    assert zobrist_hash(board_1) == zobrist_hash(board_2)
+    board_2[0, 1] = BoardPiece(1)
+    assert zobrist_hash(board_1) != zobrist_hash(board_2)
+
+    keys = set()
+    for i in range(200):
+        board, low_frees = prepare_board_for_testing()
+        keys.add((zobrist_hash(board), board.tobytes()))
+    assert len({key for key, board in keys}) == len(keys)
+
+
+def test_transposition_table_store_probe():
+    table = TranspositionTable(size_log2=4)
+    assert table.probe(12345) is None
+    table.store(12345, depth=3, value=10, flag=EXACT, move=2)
+    assert table.probe(12345) == (3, 10, EXACT, 2)
+    assert table.hits == 1 and table.misses == 1
+    # Same bucket (lowest 4 bits), different position.
+    assert table.probe(12345 + 16) is None
+    table.clear()
+    assert table.probe(12345) is None
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(size_log2=4)
+    deep, shallow, other = 1 + 16, 1 + 32, 1 + 48
+    table.store(deep, depth=8, value=1, flag=LOWER_BOUND, move=3)
+    table.store(shallow, depth=2, value=2, flag=UPPER_BOUND, move=4)
+    # The shallow entry went to the always-replace slot, the deep one is kept.
+    assert table.probe(deep) == (8, 1, LOWER_BOUND, 3)
+    assert table.probe(shallow) == (2, 2, UPPER_BOUND, 4)
+    table.store(other, depth=1, value=3, flag=EXACT)
+    assert table.probe(shallow) is None
+    assert table.probe(deep) is not None
+    # A deeper search takes the depth-preferred slot and moves the old entry down.
+    table.store(other, depth=9, value=5, flag=EXACT, move=0)
+    assert table.probe(other) == (9, 5, EXACT, 0)
+    assert table.probe(deep) == (8, 1, LOWER_BOUND, 3)
@@ -0,0 +1,191 @@
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple, List
+
+from agents.common import GenMove, PLAYER1, PLAYER2, NO_PLAYER, GameDim, GameState, \
+    initialize_game_state, apply_player_action, check_end_state, available_moves
+from agents.agent_random.random import generate_move_random
+from agents.agent_minimax.minimax import generate_move_minimax
+from agents.agent_mcts.mcts import generate_move_mcts
+
+
+AGENTS = {
+    "random": generate_move_random,
+    "minimax": generate_move_minimax,
+    "mcts": generate_move_mcts,
+}
+
+
+def play_game(
+        generate_move_1: GenMove, generate_move_2: GenMove,
+        kwargs_1: Optional[dict] = None, kwargs_2: Optional[dict] = None,
+        seed: Optional[int] = None, height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value,
+        n: int = GameDim.CONNECT.value
+) -> dict:
+    """
+    Headless version of human_vs_agent: one game, generate_move_1 plays PLAYER1 (and moves first).
+    An illegal move loses the game.
+    :param kwargs_1, kwargs_2: keyword arguments of the agents (budgets etc.).
+    :param seed: seed of np.random for the game, so it can be replayed.
+    :param height, length, n: the board and the numbers of pieces connected to win
+        (n is passed to the agents, when it's not the default four).
+    :return: {"winner": 0 (draw), 1 or 2, "moves": the columns played,
+        "move_times": seconds per move of PLAYER1 and PLAYER2, "illegal": True if the game ended by an illegal move}
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    gen_moves = {PLAYER1: generate_move_1, PLAYER2: generate_move_2}
+    gen_kwargs = {PLAYER1: dict(kwargs_1 or {}), PLAYER2: dict(kwargs_2 or {})}
+    if n != GameDim.CONNECT.value:
+        for kwargs in gen_kwargs.values():
+            kwargs["n"] = n
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    move_times = {PLAYER1: [], PLAYER2: []}
+    board = initialize_game_state(height, length)
+    moves = []
+
+    player = PLAYER1
+    while True:
+        t0 = time.perf_counter()
+        action, saved_state[player] = gen_moves[player](board.copy(), player, saved_state[player], **gen_kwargs[player])
+        move_times[player].append(time.perf_counter() - t0)
+        if action not in available_moves(board):
+            winner, illegal = PLAYER2 if player == PLAYER1 else PLAYER1, True
+            break
+        apply_player_action(board, action, player)
+        moves.append(int(action))
+        end_state = check_end_state(board, player, action, n)
+        if end_state != GameState.STILL_PLAYING:
+            winner, illegal = (player if end_state == GameState.IS_WIN else NO_PLAYER), False
+            break
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+    return {"winner": int(winner), "moves": moves, "illegal": illegal,
+            "move_times": [move_times[PLAYER1], move_times[PLAYER2]]}
+
+
+def _play_game_job(job: Tuple[str, str, dict, dict, int, Tuple[int, int, int]]) -> dict:
+    """
+    Worker side of run_tournament, agents are passed by name.
+    """
+    name_1, name_2, kwargs_1, kwargs_2, seed, dimensions = job
+    return play_game(AGENTS[name_1], AGENTS[name_2], kwargs_1, kwargs_2, seed, *dimensions)
+
+
+def elo_difference(wins: int, draws: int, losses: int) -> float:
+    """
+    Elo rating difference estimated from the score: score = 1 / (1 + 10 ** (-difference / 400)).
+    Scores of 0 or 1 are moved half a game inwards, so the estimate stays finite.
+    """
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    score = min(max(score, 0.5 / games), 1 - 0.5 / games)
+    return -400 * np.log10(1 / score - 1)
+
+
+def run_tournament(
+        agent_1: str, agent_2: str, nr_of_games: int,
+        kwargs_1: Optional[dict] = None, kwargs_2: Optional[dict] = None,
+        nr_of_workers: Optional[int] = None, results_file: Optional[str] = None, seed: int = 0,
+        height: int = GameDim.HEIGHT.value, length: int = GameDim.LENGTH.value, n: int = GameDim.CONNECT.value
+) -> dict:
+    """
+    Plays nr_of_games between two agents of AGENTS, with alternating colors
+    (agent_1 plays PLAYER1 in the even games), in parallel worker processes.
+    :param nr_of_workers: size of the process pool (1 plays in this process).
+    :param results_file: if given, the results are written there as JSON.
+    :param seed: game i is played with the seed seed + i.
+    :param height, length, n: the board and the numbers of pieces connected to win.
+    :return: win/draw/loss tallies from the point of view of agent_1, its Elo difference to agent_2,
+        timing per move of both agents and the games.
+    """
+    kwargs_1, kwargs_2 = kwargs_1 or {}, kwargs_2 or {}
+    dimensions = (height, length, n)
+    jobs = []
+    for i in range(nr_of_games):
+        if i % 2 == 0:
+            jobs.append((agent_1, agent_2, kwargs_1, kwargs_2, seed + i, dimensions))
+        else:
+            jobs.append((agent_2, agent_1, kwargs_2, kwargs_1, seed + i, dimensions))
+
+    if nr_of_workers == 1:
+        games = [_play_game_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=nr_of_workers) as pool:
+            games = list(pool.map(_play_game_job, jobs))
+
+    wins, draws, losses = 0, 0, 0
+    times = {agent_1: [], agent_2: []}
+    for i, game in enumerate(games):
+        agent_1_player = PLAYER1 if i % 2 == 0 else PLAYER2
+        if game["winner"] == NO_PLAYER:
+            draws += 1
+        elif game["winner"] == agent_1_player:
+            wins += 1
+        else:
+            losses += 1
+        game["agent_1_player"] = int(agent_1_player)
+        times[agent_1] += game["move_times"][agent_1_player - 1]
+        times[agent_2] += game["move_times"][2 - agent_1_player]
+
+    results = {
+        "agent_1": {"name": agent_1, "kwargs": kwargs_1},
+        "agent_2": {"name": agent_2, "kwargs": kwargs_2},
+        "games": nr_of_games,
+        "board": {"height": height, "length": length, "connect": n},
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "elo_difference": elo_difference(wins, draws, losses),
+        "move_time": {name: _timing(move_times) for name, move_times in times.items()},
+        "game_records": games,
+    }
+    if results_file is not None:
+        with open(results_file, "w") as file:
+            json.dump(results, file, indent=1)
+    return results
+
+
+def _timing(move_times: List[float]) -> dict:
+    if not move_times:
+        return {"moves": 0}
+    return {"moves": len(move_times), "mean": float(np.mean(move_times)),
+            "median": float(np.median(move_times)), "max": float(np.max(move_times))}
+
+
+def parse_agent(spec: str) -> Tuple[str, dict]:
+    """
+    "mcts:time_limit_ms=100,playouts_per_leaf=8" -> ("mcts", {"time_limit_ms": 100, "playouts_per_leaf": 8})
+    """
+    name, _, arguments = spec.partition(":")
+    if name not in AGENTS:
+        raise ValueError(f"Unknown agent {name}, choose from {sorted(AGENTS)}.")
+    kwargs = {}
+    for argument in filter(None, arguments.split(",")):
+        key, value = argument.split("=")
+        kwargs[key] = json.loads(value)
+    return name, kwargs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays a match between two agents.")
+    parser.add_argument("agent_1", help="name[:key=value,...], e.g. mcts:time_limit_ms=200")
+    parser.add_argument("agent_2")
+    parser.add_argument("-n", "--games", type=int, default=10)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", default="tournament_results.json")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--height", type=int, default=GameDim.HEIGHT.value)
+    parser.add_argument("--length", type=int, default=GameDim.LENGTH.value)
+    parser.add_argument("--connect", type=int, default=GameDim.CONNECT.value)
+    cli = parser.parse_args()
+
+    name_1, cli_kwargs_1 = parse_agent(cli.agent_1)
+    name_2, cli_kwargs_2 = parse_agent(cli.agent_2)
+    tally = run_tournament(name_1, name_2, cli.games, cli_kwargs_1, cli_kwargs_2, cli.workers, cli.output, cli.seed,
+                           cli.height, cli.length, cli.connect)
+    print(f"{cli.agent_1} vs {cli.agent_2}: +{tally['wins']} ={tally['draws']} -{tally['losses']}, "
+          f"Elo difference {tally['elo_difference']:.0f}")